@@ -0,0 +1,274 @@
+import hashlib
+import json
+import os
+import re
+
+import gamedata
+import tracing
+
+# --- Configuration ---
+ARCHIVE_DIR = os.environ.get("FOOTBALL_ARCHIVE_CACHE", os.path.join(".cache", "archive"))
+
+# Flattened column -> breakdownData column
+PLAY_COLUMNS = {
+    "play_number": "PLAY #",
+    "quarter": "QTR",
+    "series": "SERIES #",
+    "down": "DN",
+    "distance": "DIST",
+    "yard_line": "YARD LN",
+    "play_type": "PLAY TYPE",
+    "result": "RESULT",
+    "gain": "GN/LS",
+    "team": "TEAM",
+    "opponent": "OPP TEAM",
+    "off_formation": "OFF FORM",
+    "def_formation": "DEF FORM",
+}
+NUMERIC_COLUMNS = ("play_number", "quarter", "series", "down", "distance", "yard_line", "gain")
+
+SITUATION_KEYS = ["season", "team", "situation"]
+FORMATION_KEYS = ["season", "team", "off_formation"]
+
+# --- Game Identity ---
+def game_id(game):
+    """The game's own id when it has one, otherwise a hash of its header fields."""
+    for key in ("id", "game_id", "gameId"):
+        if game.get(key) not in (None, ""):
+            return str(game[key])
+    header = {k: v for k, v in game.items() if not isinstance(v, (dict, list))}
+    return hashlib.sha1(json.dumps(header, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+
+def content_hash(value):
+    """Hash of a game's full content, so a game corrected in place is rebuilt."""
+    return hashlib.sha1(json.dumps(value, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+
+def game_season(game):
+    """Season label from a season/year field or the year of the game date."""
+    for key in ("season", "year"):
+        if game.get(key) not in (None, ""):
+            return str(game[key])
+    for key in ("date", "game_date", "gameDate"):
+        match = re.search(r"\d{4}", str(game.get(key) or ""))
+        if match:
+            return match.group(0)
+    return "Unknown"
+
+# --- Flattening ---
+def flatten_games(games):
+    """One row per play across all games, with numeric columns coerced and situations flagged."""
+    import pandas as pd
+
+    rows = []
+    for game in games:
+        context = {
+            "game_id": game_id(game),
+            "season": game_season(game),
+            "home_team": game.get("home_team"),
+            "away_team": game.get("away_team"),
+        }
+        for play in gamedata.iter_plays(game):
+            row = dict(context)
+            for column, field in PLAY_COLUMNS.items():
+                row[column] = gamedata.breakdown_value(play, field)
+            rows.append(row)
+
+    plays = pd.DataFrame(rows, columns=["game_id", "season", "home_team", "away_team", *PLAY_COLUMNS])
+    for column in NUMERIC_COLUMNS:
+        plays[column] = pd.to_numeric(plays[column], errors="coerce")
+    for column in ("play_type", "result", "team", "opponent", "off_formation", "def_formation"):
+        plays[column] = plays[column].astype("string").str.strip()
+    return classify_plays(plays)
+
+def classify_plays(plays):
+    """
+    Adds vectorized outcome flags: `converted` (gain reached the line to gain) and
+    `success` (40% of distance on 1st down, 60% on 2nd, all of it on 3rd/4th).
+    """
+    import numpy as np
+
+    play_type = plays["play_type"].str.lower().fillna("")
+    plays["is_scrimmage"] = play_type.str.contains("run|pass", regex=True) & plays["down"].between(1, 4)
+    gain, distance, down = plays["gain"].fillna(0), plays["distance"], plays["down"]
+    plays["converted"] = gain >= distance
+    plays["success"] = np.select(
+        [down == 1, down == 2],
+        [gain >= 0.4 * distance, gain >= 0.6 * distance],
+        default=plays["converted"],
+    )
+    plays["explosive"] = gain >= 20
+    return plays
+
+# --- Aggregates ---
+def situation_masks(plays):
+    """Boolean masks for the situations the league queries ask about."""
+    down, distance, yard_line = plays["down"], plays["distance"], plays["yard_line"]
+    return {
+        "all snaps": plays["down"].notna(),
+        "3rd down": down == 3,
+        "3rd & short": (down == 3) & (distance <= 2),
+        "3rd & long": (down == 3) & (distance >= 7),
+        "4th down": down == 4,
+        "4th & short": (down == 4) & (distance <= 2),
+        # YARD LN is positive in the opponent's territory
+        "red zone": yard_line.between(1, 20),
+    }
+
+def build_aggregates(plays):
+    """Per game/team/season sums for every situation and offensive formation. All columns are additive."""
+    import pandas as pd
+
+    scrimmage = plays[plays["is_scrimmage"]]
+    parts = []
+    for name, mask in situation_masks(scrimmage).items():
+        grouped = scrimmage[mask].groupby(["game_id", "season", "team"]).agg(
+            attempts=("converted", "size"),
+            conversions=("converted", "sum"),
+            successes=("success", "sum"),
+            explosive=("explosive", "sum"),
+            yards=("gain", "sum"),
+        ).reset_index()
+        grouped["situation"] = name
+        parts.append(grouped)
+    situations = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=["game_id", *SITUATION_KEYS])
+
+    formations = scrimmage.dropna(subset=["off_formation"]).groupby(["game_id", *FORMATION_KEYS]).agg(
+        plays=("success", "size"),
+        successes=("success", "sum"),
+        explosive=("explosive", "sum"),
+        yards=("gain", "sum"),
+    ).reset_index()
+
+    return {"situations": situations, "formations": formations}
+
+def replace_games(current, new, game_ids):
+    """Swaps the stored per-game rows of `game_ids` for the freshly built ones."""
+    import pandas as pd
+
+    return {
+        name: pd.concat([current[name][~current[name]["game_id"].isin(game_ids)], new[name]], ignore_index=True)
+        for name in ("situations", "formations")
+    }
+
+def league_totals(per_game):
+    """Sums the per-game aggregates into the per team/season tables the queries read."""
+    return {
+        name: per_game[name].drop(columns="game_id").groupby(keys, as_index=False).sum(numeric_only=True)
+        for name, keys in (("situations", SITUATION_KEYS), ("formations", FORMATION_KEYS))
+    }
+
+# --- Storage ---
+def _paths():
+    return {
+        "manifest": os.path.join(ARCHIVE_DIR, "manifest.json"),
+        "situations": os.path.join(ARCHIVE_DIR, "situations.pkl"),
+        "formations": os.path.join(ARCHIVE_DIR, "formations.pkl"),
+    }
+
+def _load_store():
+    import pandas as pd
+
+    paths = _paths()
+    try:
+        with open(paths["manifest"], 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        aggregates = {name: pd.read_pickle(paths[name]) for name in ("situations", "formations")}
+        return manifest, aggregates
+    except (FileNotFoundError, json.JSONDecodeError, EOFError):
+        return None, None
+
+def _save_store(manifest, aggregates):
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    paths = _paths()
+    for name, frame in aggregates.items():
+        frame.to_pickle(paths[name])
+    with open(paths["manifest"], 'w', encoding='utf-8') as f:
+        json.dump(manifest, f)
+
+def refresh(file_path):
+    """
+    Brings the stored aggregates up to date with the game archive. When the file is
+    unchanged the stored tables are used as-is; otherwise only games that are new or
+    whose content hash changed are flattened again, and removed games are dropped.
+    Returns (aggregates, manifest).
+    """
+    with tracing.span("archive_refresh", file_path=file_path) as attrs:
+        stat = os.stat(file_path)
+        manifest, per_game = _load_store()
+        if manifest and "game_hashes" not in manifest:
+            manifest, per_game = None, None  # Stored before aggregates were kept per game
+        if manifest and manifest["file"] == os.path.abspath(file_path) \
+                and manifest["size"] == stat.st_size and manifest["mtime"] == stat.st_mtime:
+            attrs["new_games"] = 0
+            return league_totals(per_game), manifest
+
+        with open(file_path, 'r', encoding='utf-8') as f:
+            games = gamedata.parse_games(f.read())
+        games_by_id = {}
+        for game in games:
+            games_by_id.setdefault(game_id(game), []).append(game)
+        hashes = {gid: content_hash(group) for gid, group in games_by_id.items()}
+
+        stored = manifest["game_hashes"] if manifest else {}
+        changed = [gid for gid, digest in hashes.items() if stored.get(gid) != digest]
+        removed = [gid for gid in stored if gid not in hashes]
+
+        new_aggregates = build_aggregates(flatten_games([game for gid in changed for game in games_by_id[gid]]))
+        per_game = replace_games(per_game, new_aggregates, changed + removed) if per_game else new_aggregates
+        manifest = {
+            "file": os.path.abspath(file_path),
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "game_ids": list(hashes),
+            "game_hashes": hashes,
+        }
+        _save_store(manifest, per_game)
+        attrs["games"] = len(hashes)
+        attrs["new_games"] = sum(1 for gid in changed if gid not in stored)
+        attrs["changed_games"] = sum(1 for gid in changed if gid in stored)
+        attrs["removed_games"] = len(removed)
+        return league_totals(per_game), manifest
+
+# --- Queries ---
+def _situation_rate(situation, numerator):
+    def query(aggregates):
+        frame = aggregates["situations"]
+        frame = frame[frame["situation"] == situation].copy()
+        frame["rate"] = frame[numerator] / frame["attempts"]
+        return frame[["season", "team", "attempts", numerator, "rate", "yards"]]
+    return query
+
+def _formation_success(aggregates):
+    frame = aggregates["formations"].copy()
+    frame["success_rate"] = frame["successes"] / frame["plays"]
+    frame["yards_per_play"] = frame["yards"] / frame["plays"]
+    return frame.rename(columns={"plays": "attempts"})
+
+def _explosive_rate(aggregates):
+    frame = aggregates["situations"]
+    frame = frame[frame["situation"] == "all snaps"].copy()
+    frame["rate"] = frame["explosive"] / frame["attempts"]
+    return frame[["season", "team", "attempts", "explosive", "rate", "yards"]]
+
+QUERIES = {
+    "4th & short conversion rate by team": _situation_rate("4th & short", "conversions"),
+    "3rd down conversion rate by team": _situation_rate("3rd down", "conversions"),
+    "3rd & long conversion rate by team": _situation_rate("3rd & long", "conversions"),
+    "Red zone success rate by team": _situation_rate("red zone", "successes"),
+    "Explosive play rate by team (20+ yards)": _explosive_rate,
+    "Formation success rates": _formation_success,
+}
+
+def run_query(name, aggregates, season=None, team=None, min_attempts=1, limit=25):
+    """Runs a named query over the precomputed aggregates and returns the top rows."""
+    with tracing.span("archive_query", query=name) as attrs:
+        result = QUERIES[name](aggregates)
+        if season:
+            result = result[result["season"] == season]
+        if team:
+            result = result[result["team"] == team]
+        result = result[result["attempts"] >= min_attempts]
+        sort_column = "success_rate" if "success_rate" in result.columns else "rate"
+        result = result.sort_values([sort_column, "attempts"], ascending=False).head(limit)
+        attrs["rows"] = len(result)
+        return result.reset_index(drop=True)
@@ -0,0 +1,122 @@
+import argparse
+import concurrent.futures
+import contextvars
+import json
+import os
+import random
+import statistics
+import tempfile
+
+# Keep benchmark runs out of the real trace log and extraction cache; spans are read back from a scratch file
+os.environ.setdefault("FOOTBALL_TRACE_FILE", tempfile.mktemp(prefix="bench-budgets-", suffix=".jsonl"))
+os.environ.setdefault("FOOTBALL_EXTRACTION_CACHE", tempfile.mkdtemp(prefix="bench-extractions-"))
+
+import budgets
+import eggball
+import hedging
+import mock_anthropic
+import planner
+import templates
+import tracing
+
+# --- Configuration ---
+# Right-sized runs first: its tracker seeds from the trace file, and the fixed run never reads one
+SCENARIOS = ("right-sized", "fixed")
+REPORT_TYPES = ("Tactical", "Football")  # One template with a word target, one without
+
+# --- Pipelines ---
+def make_chunks(rng, scenario, run, num_chunks, min_tokens, max_tokens):
+    """Chunks of varying size; the text is unique per run so the extraction cache never answers."""
+    chunks = []
+    for i in range(num_chunks):
+        tokens = rng.randint(min_tokens, max_tokens)
+        header = f"{scenario} run {run} chunk {i}\n"
+        chunks.append(header + "p" * (tokens * planner.CHARS_PER_TOKEN - len(header)))
+    return chunks
+
+def run_report(client, chunks, report_type):
+    """One map-reduce report through the apps' own map and synthesis calls."""
+    prompt = templates.load(eggball.PROMPT_TEMPLATES[report_type])
+    total = len(chunks)
+
+    def map_one(i):
+        return eggball.generate_partial_analysis(client, chunks[i], i + 1, total, model=planner.MAP_MODEL)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=total) as executor:
+        context = contextvars.copy_context()
+        extractions = list(executor.map(lambda i: context.copy().run(map_one, i), range(total)))
+    return eggball.synthesize_analyses(client, extractions, prompt)
+
+# --- Measurement ---
+def summarize(scenario, spans):
+    maps = [s["attributes"] for s in spans if s["name"] == "map"]
+    reports = [s["attributes"] for s in spans if s["name"] == "reduce"]
+    return {
+        "scenario": scenario,
+        "map_max_tokens_mean": statistics.mean(a["max_tokens"] for a in maps),
+        "map_output_tokens": sum(a["output_tokens"] for a in maps),
+        "map_truncated": sum(a.get("stop_reason") == "max_tokens" for a in maps),
+        "map_retried": sum(a.get("retries", 0) > 0 for a in maps),
+        "report_max_tokens_mean": statistics.mean(a["max_tokens"] for a in reports),
+        "report_output_tokens": sum(a["output_tokens"] for a in reports),
+        "reserved_tokens": sum(a["max_tokens"] for a in maps + reports),
+        "report_budgets": {
+            report_type: [s["attributes"]["max_tokens"] for s in spans
+                          if s["name"] == "reduce" and s["attributes"].get("report_type") == report_type]
+            for report_type in REPORT_TYPES
+        },
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare fixed and right-sized output budgets on a mock client.")
+    parser.add_argument("--reports", type=int, default=24, help="Reports per scenario, alternating report types.")
+    parser.add_argument("--chunks", type=int, default=6)
+    parser.add_argument("--min-chunk-tokens", type=int, default=1500)
+    parser.add_argument("--max-chunk-tokens", type=int, default=6000)
+    parser.add_argument("--map-ratio", type=float, default=0.25, help="Output tokens a map call writes per chunk token.")
+    parser.add_argument("--report-tokens", type=int, default=1100, help="Median length of a finished report.")
+    parser.add_argument("--chatter", type=int, default=120, help="Tokens written after the report when nothing stops the model.")
+    parser.add_argument("--json", dest="json_path", help="Also write the results to this JSON file.")
+    args = parser.parse_args()
+
+    hedging.HEDGING_ENABLED = False
+    results = []
+    for scenario in SCENARIOS:
+        budgets.RIGHT_SIZING = scenario == "right-sized"
+        budgets.tracker = budgets.OutputTracker()
+        # Same chunk sizes and output draws for both scenarios
+        rng = random.Random(11)
+        client = mock_anthropic.MockClient(
+            map_latency=mock_anthropic.constant(0.02), text_latency=mock_anthropic.constant(0.02),
+            tokens_per_second=20_000, output_tokens=args.report_tokens, output_sigma=0.15,
+            map_output_ratio=args.map_ratio, chatter_tokens=args.chatter, seed=5,
+        )
+        for run in range(args.reports):
+            report_type = REPORT_TYPES[run % len(REPORT_TYPES)]
+            chunks = make_chunks(rng, scenario, run, args.chunks, args.min_chunk_tokens, args.max_chunk_tokens)
+            with tracing.start_trace("bench_budgets", mode=scenario) as attrs:
+                attrs["report_type"] = report_type
+                run_report(client, chunks, report_type)
+        spans = [s for s in tracing.load_spans(tracing.TRACE_FILE) if s.get("mode") == scenario]
+        types = {s["trace_id"]: s["attributes"]["report_type"] for s in spans if s["name"] == "report"}
+        for s in spans:
+            s["attributes"].setdefault("report_type", types.get(s["trace_id"]))
+        results.append(summarize(scenario, spans))
+
+    print(f"{'scenario':<13}{'map max_tokens':>16}{'map out':>9}{'truncated':>11}{'retried':>9}"
+          f"{'report max_tokens':>19}{'report out':>12}{'reserved':>10}")
+    for row in results:
+        print(
+            f"{row['scenario']:<13}{row['map_max_tokens_mean']:>16.0f}{row['map_output_tokens']:>9}"
+            f"{row['map_truncated']:>11}{row['map_retried']:>9}{row['report_max_tokens_mean']:>19.0f}"
+            f"{row['report_output_tokens']:>12}{row['reserved_tokens']:>10}"
+        )
+    for report_type in REPORT_TYPES:
+        print(f"right-sized {report_type} report budgets, in order: {results[0]['report_budgets'][report_type]}")
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+import argparse
+import http.server
+import json
+import os
+import tempfile
+import threading
+import time
+
+# Keep benchmark runs out of the real trace log and clip status cache
+os.environ.setdefault("FOOTBALL_TRACE_FILE", os.devnull)
+os.environ.setdefault("FOOTBALL_CLIP_CACHE", tempfile.mkdtemp(prefix="bench-clips-"))
+
+import clips
+
+# --- Stub Server ---
+# path prefix -> (expected ok, expected status); "slow" never answers within the timeout.
+# A 5xx or a timeout leaves the clip unknown (ok None) and is checked again on every run.
+KINDS = {
+    "ok": (True, 200),
+    "missing": (False, 404),
+    "gone": (False, 410),
+    "nohead": (True, 206),
+    "broken": (None, 503),
+    "slow": (None, None),
+}
+
+class StubServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128  # The default backlog of 5 drops connects from a 20-connection pool
+
+class StubHandler(http.server.BaseHTTPRequestHandler):
+    """Answers clip URLs by their first path segment, one of KINDS."""
+    slow_seconds = 2.0
+
+    def _answer(self, method):
+        kind = self.path.strip("/").split("/")[0]
+        if kind == "slow":
+            time.sleep(self.slow_seconds)
+            status = 200
+        elif kind == "missing":
+            status = 404
+        elif kind == "gone":
+            status = 410
+        elif kind == "broken":
+            status = 503
+        elif kind == "nohead":
+            # Servers that refuse HEAD get a one-byte ranged GET instead
+            status = 405 if method == "HEAD" else 206
+        else:
+            status = 200
+        try:
+            self.send_response(status)
+            self.send_header("Content-Length", "1" if method == "GET" and status < 400 else "0")
+            self.end_headers()
+            if method == "GET" and status < 400:
+                self.wfile.write(b"x")
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # The client gave up on a slow URL
+
+    def do_HEAD(self):
+        self._answer("HEAD")
+
+    def do_GET(self):
+        self._answer("GET")
+
+    def log_message(self, *args):
+        pass
+
+def start_stub(slow_seconds):
+    StubHandler.slow_seconds = slow_seconds
+    server = StubServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+# --- Checks ---
+def check(statuses, urls):
+    """Compares each URL's status with what its kind should produce; returns the mismatches."""
+    failures = []
+    for url, kind in urls.items():
+        expected_ok, expected_status = KINDS[kind]
+        result = statuses[url]
+        if result["ok"] != expected_ok or result["status"] != expected_status:
+            failures.append({"url": url, "expected": [expected_ok, expected_status], "got": result})
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description="Check clips.validate_urls against a local HTTP stub with OK, 404/410, HEAD-refusing, 503 and timing-out URLs.")
+    parser.add_argument("--per-kind", type=int, default=25, help="URLs of each kind.")
+    parser.add_argument("--timeout", type=float, default=0.5, help="Request timeout used for the run, in seconds.")
+    parser.add_argument("--json", dest="json_path", help="Also write the results to this JSON file.")
+    args = parser.parse_args()
+
+    clips.REQUEST_TIMEOUT_SECONDS = args.timeout
+    server = start_stub(slow_seconds=args.timeout * 4)
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    urls = {f"{base}/{kind}/clip-{i}.mp4": kind for kind in KINDS for i in range(args.per_kind)}
+
+    try:
+        start = time.perf_counter()
+        first = clips.validate_urls(list(urls))
+        first_s = time.perf_counter() - start
+        start = time.perf_counter()
+        second = clips.validate_urls(list(urls))
+        second_s = time.perf_counter() - start
+    finally:
+        server.shutdown()
+
+    failures = check(first, urls) + check(second, urls)
+    # Only definite results may be stored; an unknown clip is checked again next time
+    stored = clips._load_statuses()
+    for url, kind in urls.items():
+        if (url in stored) != (KINDS[kind][0] is not None):
+            failures.append({"url": url, "expected": ["stored" if KINDS[kind][0] is not None else "not stored"], "got": stored.get(url)})
+    result = {
+        "urls": len(urls),
+        "first_run_s": first_s,
+        "second_run_s": second_s,
+        "timed_out": sum(1 for url, kind in urls.items() if kind == "slow" and first[url].get("error")),
+        "failures": failures,
+    }
+    print(f"{len(urls)} URLs ({args.per_kind} each of {', '.join(KINDS)})")
+    print(f"first run {first_s:.2f}s, second run {second_s:.2f}s (unknown URLs checked again), {result['timed_out']} timed out")
+    for failure in failures[:10]:
+        print(f"  FAIL {failure['url']}: expected {failure['expected']}, got {failure['got']}")
+    print("all statuses as expected" if not failures else f"{len(failures)} unexpected statuses")
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2)
+    raise SystemExit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
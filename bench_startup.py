@@ -0,0 +1,101 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# --- Configuration ---
+APPS = ("eggball.py", "jim.py", "postgame.py", "league.py")
+HEAVY_MODULES = ("anthropic", "pandas", "fitz")
+
+# Runs inside a fresh interpreter so every measurement is a true cold start.
+_PROBE = r"""
+import json, sys, time
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+framework_ms = (time.perf_counter() - start) * 1000
+
+# The server keeps compiled script bytecode across reruns but AppTest recompiles every
+# run; share one cache so rerun timings reflect the app rather than the test harness.
+import streamlit.testing.v1.local_script_runner as local_script_runner
+from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+_shared_script_cache = ScriptCache()
+local_script_runner.ScriptCache = lambda: _shared_script_cache
+
+at = AppTest.from_file(sys.argv[1], default_timeout=120)
+at.secrets["ANTHROPIC_KEY"] = "bench-key"
+start = time.perf_counter()
+at.run()
+first_run_ms = (time.perf_counter() - start) * 1000
+
+rerun_ms = []
+for _ in range(int(sys.argv[2])):
+    start = time.perf_counter()
+    at.run()
+    rerun_ms.append((time.perf_counter() - start) * 1000)
+
+print(json.dumps({
+    "framework_ms": framework_ms,
+    "first_run_ms": first_run_ms,
+    "rerun_ms": rerun_ms,
+    "heavy_modules_loaded": [m for m in sys.argv[3].split(",") if m in sys.modules],
+    "exceptions": [str(e.message) for e in at.exception],
+}))
+"""
+
+# --- Measurement ---
+def measure_app(app_path, reruns):
+    """Cold-starts one app in a new interpreter and returns its timings."""
+    env = dict(os.environ, FOOTBALL_TRACE_FILE=os.devnull)
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-c", _PROBE, app_path, str(reruns), ",".join(HEAVY_MODULES)],
+        capture_output=True, text=True, env=env, check=True
+    )
+    wall_ms = (time.perf_counter() - start) * 1000
+    sample = json.loads(result.stdout.strip().splitlines()[-1])
+    sample["cold_start_ms"] = wall_ms
+    return sample
+
+def summarize(app_path, samples):
+    reruns = [ms for sample in samples for ms in sample["rerun_ms"]]
+    return {
+        "app": app_path,
+        "cold_start_ms": statistics.median(s["cold_start_ms"] for s in samples),
+        "first_run_ms": statistics.median(s["first_run_ms"] for s in samples),
+        "rerun_p50_ms": statistics.median(reruns) if reruns else None,
+        "rerun_max_ms": max(reruns) if reruns else None,
+        "heavy_modules_loaded": samples[-1]["heavy_modules_loaded"],
+        "exceptions": samples[-1]["exceptions"],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold start and per-rerun time of the Streamlit apps.")
+    parser.add_argument("apps", nargs="*", default=APPS, help="App scripts to measure (default: all apps).")
+    parser.add_argument("--runs", type=int, default=3, help="Cold starts per app; the median is reported.")
+    parser.add_argument("--reruns", type=int, default=5, help="Reruns timed after each cold start.")
+    parser.add_argument("--json", dest="json_path", help="Also write the results to this JSON file.")
+    args = parser.parse_args()
+
+    results = []
+    for app_path in args.apps:
+        samples = [measure_app(app_path, args.reruns) for _ in range(args.runs)]
+        results.append(summarize(app_path, samples))
+
+    print(f"{'app':<14}{'cold start':>12}{'first run':>12}{'rerun p50':>12}  heavy modules loaded")
+    for row in results:
+        print(
+            f"{row['app']:<14}{row['cold_start_ms']:>10.0f}ms{row['first_run_ms']:>10.0f}ms"
+            f"{row['rerun_p50_ms'] or 0:>10.1f}ms  {', '.join(row['heavy_modules_loaded']) or '-'}"
+        )
+        for message in row["exceptions"]:
+            print(f"  ! {message}")
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+from types import SimpleNamespace
+
+# Keep benchmark runs out of the real trace log and extraction cache
+os.environ.setdefault("FOOTBALL_TRACE_FILE", os.devnull)
+os.environ.setdefault("FOOTBALL_EXTRACTION_CACHE", tempfile.mkdtemp(prefix="bench-extractions-"))
+
+import eggball
+import mock_anthropic
+import pipeline
+import planner
+import speculative
+import templates
+
+# --- Configuration ---
+MODES = ("barrier", "concurrent", "speculative")
+_NO_PROGRESS = SimpleNamespace(progress=lambda *args, **kwargs: None)
+
+# --- Pipelines ---
+def run_barrier(client, text_chunks, prompt, clock):
+    """The apps' default path: map every chunk in order, then synthesize."""
+    attrs = {}
+    def map_chunk(chunk, part_num, total_parts, model):
+        return eggball.generate_partial_analysis(client, chunk, part_num, total_parts, model=model)
+    extractions = pipeline.run_map_step(
+        map_chunk, text_chunks, planner.MAP_MODEL, _NO_PROGRESS, len(text_chunks) + 1, attrs, eggball.LABELS
+    )
+    return eggball.synthesize_analyses(client, extractions, prompt, on_text=clock)
+
+def run_reduce_early(client, text_chunks, prompt, clock, lead_fraction):
+    """Concurrent map through speculative.reduce_early; a lead of 1.0 never drafts."""
+    total = len(text_chunks)
+    map_jobs = [
+        lambda i=i, chunk=chunk: eggball.generate_partial_analysis(client, chunk, i + 1, total, model=planner.MAP_MODEL)
+        for i, chunk in enumerate(text_chunks)
+    ]
+
+    def synthesize(extractions, total_parts, prefill, emit, should_stop):
+        return eggball.synthesize_analyses(
+            client, extractions, prompt, on_text=emit, total_parts=total_parts, prefill=prefill, should_stop=should_stop
+        )
+
+    report, _ = speculative.reduce_early(map_jobs, synthesize, on_text=clock, lead_fraction=lead_fraction, poll_seconds=0.02)
+    return report
+
+def measure(mode, client, num_chunks, run, prompt, lead_fraction):
+    """One report end to end: time to the first visible report text and to the finished report."""
+    # Unique chunk text per run so the extraction cache never short-circuits a map call
+    text_chunks = [f"{mode} run {run} chunk {i}\n" + "play line\n" * 200 for i in range(num_chunks)]
+    start = time.perf_counter()
+    first = {}
+
+    def clock(text):
+        if text and "at" not in first:
+            first["at"] = time.perf_counter()
+
+    if mode == "barrier":
+        report = run_barrier(client, text_chunks, prompt, clock)
+    else:
+        report = run_reduce_early(client, text_chunks, prompt, clock, 1.0 if mode == "concurrent" else lead_fraction)
+    total_ms = (time.perf_counter() - start) * 1000
+    return {
+        "first_token_ms": (first["at"] - start) * 1000 if first else None,
+        "total_ms": total_ms,
+        "ok": report is not None,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare perceived report latency of barrier and speculative synthesis on a mock client.")
+    parser.add_argument("--runs", type=int, default=5, help="Reports per mode; medians are reported.")
+    parser.add_argument("--chunks", type=int, default=6, help="Map chunks per report.")
+    parser.add_argument("--map-median", type=float, default=1.0, help="Median map call latency in seconds.")
+    parser.add_argument("--map-sigma", type=float, default=0.6, help="Lognormal spread of map latency.")
+    parser.add_argument("--ttft", type=float, default=0.8, help="Seconds before a synthesis call's first token.")
+    parser.add_argument("--tokens-per-second", type=float, default=80.0)
+    parser.add_argument("--output-tokens", type=int, default=600, help="Length of a full synthesized report.")
+    parser.add_argument("--lead", type=float, default=speculative.LEAD_FRACTION, help="Share of leading chunks before drafting.")
+    parser.add_argument("--json", dest="json_path", help="Also write the results to this JSON file.")
+    args = parser.parse_args()
+
+    prompt = templates.load(eggball.PROMPT_TEMPLATES["Tactical"])
+    results = []
+    for mode in MODES:
+        # Same distributions and seed for every mode
+        client = mock_anthropic.MockClient(
+            map_latency=mock_anthropic.lognormal(args.map_median, args.map_sigma),
+            text_latency=mock_anthropic.constant(args.ttft),
+            tokens_per_second=args.tokens_per_second,
+            output_tokens=args.output_tokens,
+        )
+        samples = [measure(mode, client, args.chunks, run, prompt, args.lead) for run in range(args.runs)]
+        firsts = [s["first_token_ms"] for s in samples if s["first_token_ms"] is not None]
+        results.append({
+            "mode": mode,
+            "first_token_p50_ms": statistics.median(firsts) if firsts else None,
+            "total_p50_ms": statistics.median(s["total_ms"] for s in samples),
+            "failures": sum(not s["ok"] for s in samples),
+            "calls": dict(client.calls),
+        })
+
+    print(f"{'mode':<13}{'first token':>13}{'finished':>12}  calls")
+    for row in results:
+        print(
+            f"{row['mode']:<13}{row['first_token_p50_ms'] or 0:>11.0f}ms{row['total_p50_ms']:>10.0f}ms  "
+            f"map {row['calls']['map']}, text {row['calls']['text']}, cancelled {row['calls']['cancelled']}"
+            + (f"  ! {row['failures']} failed" if row["failures"] else "")
+        )
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
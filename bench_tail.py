@@ -0,0 +1,141 @@
+import argparse
+import concurrent.futures
+import contextvars
+import json
+import os
+import statistics
+import tempfile
+import time
+
+# Keep benchmark runs out of the real trace log and extraction cache
+os.environ.setdefault("FOOTBALL_TRACE_FILE", os.devnull)
+os.environ.setdefault("FOOTBALL_EXTRACTION_CACHE", tempfile.mkdtemp(prefix="bench-extractions-"))
+
+import eggball
+import extraction
+import hedging
+import mock_anthropic
+import pipeline
+import planner
+import speculative
+
+# --- Measurement ---
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else None
+
+def measure_calls(client, calls, concurrency, streaming):
+    """Runs `calls` independent map (or streamed reduce) calls; returns per-call seconds to the answer."""
+    def one(i):
+        start = time.perf_counter()
+        first = {}
+
+        def on_text(text):
+            if text and "at" not in first:
+                first["at"] = time.perf_counter()
+
+        try:
+            if streaming:
+                eggball.call_anthropic_api(client, f"call {i}", stage="reduce", model=planner.SYNTHESIS_MODEL, on_text=on_text)
+            else:
+                eggball.call_anthropic_api(
+                    client, f"call {i}", stage="map", model=planner.MAP_MODEL,
+                    tool=extraction.EXTRACTION_TOOL, max_tokens=pipeline.MAP_MAX_TOKENS
+                )
+        except hedging.StageTimeout:
+            pass
+        return (first.get("at") if streaming and first else time.perf_counter()) - start
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return list(executor.map(lambda i: contextvars.copy_context().run(one, i), range(calls)))
+
+def summarize(name, seconds, client):
+    return {
+        "scenario": name,
+        "p50_s": statistics.median(seconds),
+        "p95_s": percentile(seconds, 0.95),
+        "p99_s": percentile(seconds, 0.99),
+        "max_s": max(seconds),
+        "calls_sent": client.calls["map"] + client.calls["text"],
+        "cancelled": client.calls["cancelled"],
+    }
+
+def measure_deadline(client, chunks, deadline, reserve):
+    """One concurrent map-reduce report under a report deadline; returns its time and gaps."""
+    saved = hedging.SYNTHESIS_RESERVE_SECONDS
+    hedging.SYNTHESIS_RESERVE_SECONDS = reserve
+    try:
+        map_jobs = [
+            lambda i=i: eggball.generate_partial_analysis(client, f"deadline chunk {i} {time.time()}", i + 1, chunks, model=planner.MAP_MODEL)
+            for i in range(chunks)
+        ]
+
+        def synthesize(extractions, total_parts, prefill, emit, should_stop):
+            return eggball.synthesize_analyses(
+                client, extractions, "Tactical", on_text=emit, total_parts=total_parts, prefill=prefill, should_stop=should_stop
+            )
+
+        start = time.perf_counter()
+        with hedging.report_deadline(deadline):
+            report, extractions = speculative.reduce_early(map_jobs, synthesize, lead_fraction=1.0, poll_seconds=0.02)
+        return {
+            "scenario": f"report, {deadline:.0f}s deadline",
+            "report_s": time.perf_counter() - start,
+            "report_ok": report is not None,
+            "missing_chunks": sum(1 for e in extractions or [] if e is None),
+        }
+    finally:
+        hedging.SYNTHESIS_RESERVE_SECONDS = saved
+
+def main():
+    parser = argparse.ArgumentParser(description="Tail latency of model calls with and without hedging, on a mock client with injected stalls.")
+    parser.add_argument("--calls", type=int, default=200, help="Calls per scenario.")
+    parser.add_argument("--warmup", type=int, default=40, help="Untimed calls that fill the latency window first, as past traces do in the apps.")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--median", type=float, default=1.0, help="Median call latency in seconds.")
+    parser.add_argument("--sigma", type=float, default=0.3, help="Lognormal spread of call latency.")
+    parser.add_argument("--stall-rate", type=float, default=0.02, help="Share of calls that stall.")
+    parser.add_argument("--stall", type=float, default=20.0, help="Seconds a stalled call hangs.")
+    parser.add_argument("--deadline", type=float, default=8.0, help="Report deadline for the degradation run.")
+    parser.add_argument("--reserve", type=float, default=4.0, help="Seconds of that deadline kept for synthesis.")
+    parser.add_argument("--json", dest="json_path", help="Also write the results to this JSON file.")
+    args = parser.parse_args()
+
+    latency = mock_anthropic.with_stalls(mock_anthropic.lognormal(args.median, args.sigma), args.stall_rate, args.stall)
+    results = []
+    for streaming in (False, True):
+        for hedge in (False, True):
+            hedging.HEDGING_ENABLED = hedge
+            hedging.tracker = hedging.LatencyTracker()
+            warmup = mock_anthropic.MockClient(map_latency=latency, text_latency=latency, output_tokens=40, tokens_per_second=400, seed=1)
+            measure_calls(warmup, args.warmup, args.concurrency, streaming)
+            client = mock_anthropic.MockClient(map_latency=latency, text_latency=latency, output_tokens=40, tokens_per_second=400, seed=7)
+            seconds = measure_calls(client, args.calls, args.concurrency, streaming)
+            name = f"{'reduce ttft' if streaming else 'map'}, {'hedged' if hedge else 'no hedge'}"
+            results.append(summarize(name, seconds, client))
+
+    # Every chunk stalls half the time: the report must still land inside the deadline
+    hedging.HEDGING_ENABLED = False
+    client = mock_anthropic.MockClient(
+        map_latency=mock_anthropic.with_stalls(mock_anthropic.lognormal(args.median, args.sigma), 0.5, args.stall * 3),
+        output_tokens=40, tokens_per_second=400, seed=3,
+    )
+    deadline_run = measure_deadline(client, 6, args.deadline, args.reserve)
+
+    print(f"{'scenario':<24}{'p50':>8}{'p95':>8}{'p99':>8}{'max':>8}  calls sent / cancelled")
+    for row in results:
+        print(
+            f"{row['scenario']:<24}{row['p50_s']:>7.2f}s{row['p95_s']:>7.2f}s{row['p99_s']:>7.2f}s{row['max_s']:>7.2f}s"
+            f"  {row['calls_sent']} / {row['cancelled']}"
+        )
+    print(
+        f"{deadline_run['scenario']}: finished in {deadline_run['report_s']:.2f}s, "
+        f"{'report written' if deadline_run['report_ok'] else 'no report'}, {deadline_run['missing_chunks']} of 6 chunks missing"
+    )
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump({"calls": results, "deadline": deadline_run}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+import collections
+import hashlib
+import math
+import os
+import threading
+
+import planner
+import templates
+import tracing
+
+# --- Configuration ---
+# Off, every map call asks for the map ceiling and every report for MAX_OUTPUT_TOKENS with no stop sequence
+RIGHT_SIZING = os.environ.get("FOOTBALL_RIGHT_SIZE", "1") != "0"
+# Hard ceiling for any call, and the normal ceiling for map calls
+MAX_OUTPUT_TOKENS = 4096
+MAX_MAP_OUTPUT_TOKENS = 2048
+MIN_MAP_OUTPUT_TOKENS = 512
+MIN_REPORT_OUTPUT_TOKENS = 1024
+MIN_CONTINUATION_TOKENS = 512
+TOKENS_PER_WORD = 1.5  # Markdown prose with clip references runs a little above plain English
+HEADROOM = 1.25
+# Map output tokens per chunk token assumed until enough calls have been measured
+MAP_OUTPUT_RATIO = 0.3
+# Live-story update tokens per section (each new drive, plus the revised themes) assumed until measured
+UPDATE_SECTION_TOKENS = 300
+BUDGET_QUANTILE = 0.95
+BUDGET_WINDOW = 200
+MIN_SAMPLES = 10
+# When more than this share of recent calls hit max_tokens, budgets for that stage grow
+TRUNCATION_TOLERANCE = 0.05
+GROWTH = 1.5
+
+# Reports end with this line; it is also a stop sequence, so nothing after it is generated or billed
+END_MARKER = "<!-- end of report -->"
+END_NOTE = f"When every section the request asks for is written, end with the line {END_MARKER} and write nothing after it." if RIGHT_SIZING else ""
+
+# --- Output Tracking ---
+class OutputTracker:
+    """
+    Recent output sizes per (budget key, model): tokens per chunk token for map calls,
+    whole-answer tokens for reports, plus whether each call hit its max_tokens. The
+    first lookup seeds the window from the most recent spans in the trace file.
+    """
+
+    def __init__(self, window=BUDGET_WINDOW):
+        self._sizes = collections.defaultdict(lambda: collections.deque(maxlen=window))
+        self._truncated = collections.defaultdict(lambda: collections.deque(maxlen=window))
+        self._lock = threading.Lock()
+        self._seeded = False
+
+    def _seed(self):
+        if self._seeded:
+            return
+        self._seeded = True
+        for record in tracing.load_spans(tail_bytes=tracing.SEED_TAIL_BYTES):
+            attrs = record.get("attributes", {})
+            if "budget_output_tokens" in attrs:
+                self._add(attrs["budget_key"], attrs.get("model"), attrs["budget_output_tokens"],
+                          attrs.get("budget_basis_tokens"), attrs.get("stop_reason"))
+
+    def _add(self, key, model, output_tokens, basis_tokens, stop_reason):
+        truncated = stop_reason == "max_tokens"
+        self._truncated[(key, model)].append(truncated)
+        if not truncated:
+            size = output_tokens / basis_tokens if basis_tokens else output_tokens
+            self._sizes[(key, model)].append(size)
+
+    def record(self, key, model, output_tokens, basis_tokens=None, stop_reason=None):
+        with self._lock:
+            self._seed()
+            self._add(key, model, output_tokens, basis_tokens, stop_reason)
+
+    def quantile(self, key, model, q=BUDGET_QUANTILE):
+        """The q-quantile of recent complete outputs, or None with fewer than MIN_SAMPLES."""
+        with self._lock:
+            self._seed()
+            sizes = sorted(self._sizes[(key, model)])
+        if len(sizes) < MIN_SAMPLES:
+            return None
+        return sizes[min(len(sizes) - 1, int(q * len(sizes)))]
+
+    def truncated_share(self, key, model):
+        with self._lock:
+            self._seed()
+            recent = self._truncated[(key, model)]
+            return sum(recent) / len(recent) if recent else 0.0
+
+tracker = OutputTracker()
+
+# --- Budgets ---
+def _grow_if_truncating(key, model, tokens):
+    return tokens * GROWTH if tracker.truncated_share(key, model) > TRUNCATION_TOLERANCE else tokens
+
+def map_budget(chunk_text, model, ceiling=MAX_MAP_OUTPUT_TOKENS):
+    """
+    Output budget for extracting one chunk: its estimated size times the observed p95
+    ratio of output to chunk tokens (MAP_OUTPUT_RATIO until measured), with headroom.
+    """
+    basis = planner.estimate_tokens(chunk_text)
+    if not RIGHT_SIZING:
+        return {"key": "map", "max_tokens": ceiling, "basis_tokens": basis, "stop_sequences": None}
+    ratio = tracker.quantile("map", model) or MAP_OUTPUT_RATIO
+    tokens = _grow_if_truncating("map", model, ratio * basis * HEADROOM)
+    return {
+        "key": "map",
+        "max_tokens": int(min(ceiling, max(MIN_MAP_OUTPUT_TOKENS, math.ceil(tokens)))),
+        "basis_tokens": basis,
+        "stop_sequences": None,
+    }
+
+def report_budget(template_text, model):
+    """
+    Output budget for a report written from `template_text`: the larger of its word
+    target (e.g. "600–800 words") and the observed p95 length of complete reports from
+    the same template, with headroom. Reports end on END_MARKER as a stop sequence.
+    """
+    key = f"report:{hashlib.sha1(template_text.encode('utf-8')).hexdigest()[:10]}"
+    if not RIGHT_SIZING:
+        return {"key": key, "max_tokens": MAX_OUTPUT_TOKENS, "basis_tokens": None, "stop_sequences": None}
+    words = templates.word_target(template_text)
+    observed = tracker.quantile(key, model)
+    candidates = [size * HEADROOM for size in (words and words * TOKENS_PER_WORD, observed) if size]
+    tokens = _grow_if_truncating(key, model, max(candidates)) if candidates else MAX_OUTPUT_TOKENS
+    return {
+        "key": key,
+        "max_tokens": int(min(MAX_OUTPUT_TOKENS, max(MIN_REPORT_OUTPUT_TOKENS, math.ceil(tokens)))),
+        "basis_tokens": None,
+        "stop_sequences": [END_MARKER],
+    }
+
+def update_budget(new_drives, model):
+    """
+    Output budget for a live-story update covering `new_drives` drives and the revised
+    themes: the observed p95 tokens per section (UPDATE_SECTION_TOKENS until measured),
+    with headroom. Updates end on END_MARKER as a stop sequence.
+    """
+    basis = new_drives + 1
+    if not RIGHT_SIZING:
+        return {"key": "live_update", "max_tokens": MAX_OUTPUT_TOKENS, "basis_tokens": basis, "stop_sequences": None}
+    per_section = tracker.quantile("live_update", model) or UPDATE_SECTION_TOKENS
+    tokens = _grow_if_truncating("live_update", model, per_section * basis * HEADROOM)
+    return {
+        "key": "live_update",
+        "max_tokens": int(min(MAX_OUTPUT_TOKENS, max(MIN_REPORT_OUTPUT_TOKENS, math.ceil(tokens)))),
+        "basis_tokens": basis,
+        "stop_sequences": [END_MARKER],
+    }
+
+def continuation_tokens(budget, prefill):
+    """max_tokens for continuing a prefilled answer: the budget less what the prefill already used."""
+    return max(MIN_CONTINUATION_TOKENS, budget["max_tokens"] - planner.estimate_tokens(prefill or ""))
+
+def record(attrs, budget, model, output_tokens, stop_reason, prefill=None):
+    """Puts a call's budget on its span and feeds the measured output into later budgets."""
+    attrs["budget_key"] = budget["key"]
+    if budget["basis_tokens"]:
+        attrs["budget_basis_tokens"] = budget["basis_tokens"]
+    if stop_reason in ("stopped_early", "timed_out"):
+        return  # A cut-short answer says nothing about how long a full one runs
+    total = output_tokens + (planner.estimate_tokens(prefill) if prefill else 0)
+    attrs["budget_output_tokens"] = total
+    tracker.record(budget["key"], model, total, budget["basis_tokens"], stop_reason)
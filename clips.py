@@ -0,0 +1,278 @@
+import hashlib
+import json
+import os
+import re
+import time
+
+import drives
+import gamedata
+import projection
+import tracing
+
+# --- Configuration ---
+CLIP_CACHE_DIR = os.environ.get("FOOTBALL_CLIP_CACHE", os.path.join(".cache", "clips"))
+STATUS_TTL_SECONDS = int(os.environ.get("FOOTBALL_CLIP_STATUS_TTL", 6 * 60 * 60))
+MAX_CONNECTIONS = 20
+REQUEST_TIMEOUT_SECONDS = 5.0
+# Statuses that mean the clip is gone; other errors and timeouts may pass, so they are never cached
+DEAD_STATUSES = (404, 410)
+
+DURATION_KEYS = ("duration", "clipduration", "clip_duration", "length", "duration_seconds")
+
+UNAVAILABLE_NOTE = "(clip unavailable)"
+
+_LINK_PATTERN = re.compile(r"\[([^\]]*)\]\(([^)\s]+)\)")
+
+# --- Manifest ---
+def _find_duration(node):
+    """First duration-like value anywhere in a play record; numbers are returned as seconds."""
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        if isinstance(current, dict):
+            for key, value in current.items():
+                if key.lower().replace(" ", "_") in DURATION_KEYS and value not in (None, ""):
+                    try:
+                        return float(value)
+                    except (TypeError, ValueError):
+                        return value
+                stack.append(value)
+        elif isinstance(current, list):
+            stack.extend(current)
+    return None
+
+def build_manifest(game_data, clip_refs, drive_list=None):
+    """
+    Lists every video clip in a game under the clip id the model saw. Each entry holds
+    the play it belongs to (number, drive, formations, type, result), its URL, duration
+    when the export has one, and a thumbnail URL when the play carries an image.
+    """
+    index = drives.play_index(drive_list) if drive_list else {}
+    by_play = {str(number): key for number, key in index.items()}
+    manifest = {}
+    for play in gamedata.iter_plays(game_data):
+        play_number = gamedata.breakdown_value(play, "PLAY #")
+        for url in projection.video_urls(play):
+            ref = clip_refs.ref(url)
+            manifest[ref] = {
+                "ref": ref,
+                "url": url,
+                "play_number": play_number,
+                "drive": by_play.get(str(play_number).strip()),
+                "duration": _find_duration(play),
+                "off_formation": gamedata.breakdown_value(play, "OFF FORM"),
+                "def_formation": gamedata.breakdown_value(play, "DEF FORM"),
+                "play_type": gamedata.breakdown_value(play, "PLAY TYPE"),
+                "result": gamedata.breakdown_value(play, "RESULT"),
+                "thumbnail": projection.thumbnail_url(play),
+            }
+    return manifest
+
+# --- Link Resolution ---
+def _match_url(target, by_url):
+    """
+    Finds the manifest entry a link target points at: an exact URL, or a truncated one
+    that is a prefix of exactly one known clip URL.
+    """
+    if target in by_url:
+        return by_url[target]
+    candidates = [entry for url, entry in by_url.items() if url.startswith(target)]
+    return candidates[0] if len(candidates) == 1 else None
+
+def resolve_links(report, manifest, statuses=None):
+    """
+    Rewrites the Markdown links in a generated report against the clip manifest. Clip ids
+    and truncated clip URLs become the full URL; links to clips that are not in the
+    manifest, or that the validator found dead, keep their text and are marked
+    unavailable. Other links are left alone. Returns (text, stats).
+    """
+    stats = {"links": 0, "resolved": 0, "repaired": 0, "unknown": 0, "dead": 0}
+    if not report:
+        return report, stats
+    by_url = {entry["url"]: entry for entry in manifest.values()}
+    statuses = statuses or {}
+
+    def replace(match):
+        label, target = match.group(1), match.group(2)
+        entry = manifest.get(target)
+        is_clip = entry is not None or target.startswith("clip:") \
+            or target.split("?")[0].lower().endswith(projection.VIDEO_EXTENSIONS)
+        if entry is None and target.startswith("http"):
+            entry = _match_url(target, by_url)
+            is_clip = is_clip or entry is not None
+        if not is_clip:
+            return match.group(0)
+
+        stats["links"] += 1
+        if entry is None:
+            stats["unknown"] += 1
+            return f"{label} {UNAVAILABLE_NOTE}"
+        if statuses.get(entry["url"], {}).get("ok") is False:
+            stats["dead"] += 1
+            return f"{label} {UNAVAILABLE_NOTE}"
+        stats["resolved"] += 1
+        if target != entry["url"] and not target.startswith("clip:"):
+            stats["repaired"] += 1
+        return f"[{label}]({entry['url']})"
+
+    return _LINK_PATTERN.sub(replace, report), stats
+
+def linked_refs(report, manifest):
+    """Manifest entries whose URL appears in a resolved report, in order of appearance."""
+    by_url = {entry["url"]: entry for entry in manifest.values()}
+    seen = dict.fromkeys(match.group(2) for match in _LINK_PATTERN.finditer(report or ""))
+    return [by_url[url] for url in seen if url in by_url]
+
+def finalize_report(report, manifest, clip_refs, validate=True):
+    """
+    Resolves a generated report's clip links against the manifest, checks the linked
+    URLs when `validate` is set, and expands any bare clip ids left in the text. A
+    failed validation never loses the report; the links are then kept unchecked.
+    Returns (text, linked manifest entries).
+    """
+    with tracing.span("resolve_clip_links", clips=len(manifest)) as attrs:
+        text, first_pass = resolve_links(report, manifest)
+        statuses = {}
+        if validate:
+            try:
+                statuses = validate_urls([entry["url"] for entry in linked_refs(text, manifest)])
+            except Exception as e:
+                tracing.mark_error(attrs, f"validation skipped: {e}")
+        text, stats = resolve_links(text, manifest, statuses)
+        stats["repaired"] = first_pass["repaired"]
+        stats["unknown"] = first_pass["unknown"]
+        attrs.update(stats)
+        return clip_refs.expand(text), linked_refs(text, manifest)
+
+# --- Validation ---
+def _status_path():
+    return os.path.join(CLIP_CACHE_DIR, "status.json")
+
+def _load_statuses():
+    try:
+        with open(_status_path(), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def _save_statuses(statuses):
+    os.makedirs(CLIP_CACHE_DIR, exist_ok=True)
+    path = _status_path()
+    with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+        json.dump(statuses, f)
+    os.replace(f"{path}.tmp", path)
+
+def _timeout(httpx):
+    """
+    Per-request timeout. Waiting for a pooled connection is not limited: with every
+    connection held by slow hosts, the queued URLs would otherwise fail as dead.
+    """
+    return httpx.Timeout(REQUEST_TIMEOUT_SECONDS, pool=None)
+
+async def _check_one(client, url):
+    """
+    HEAD a URL, falling back to a one-byte GET for servers that refuse HEAD. `ok` is
+    None when the answer says nothing definite: a timeout, a connection error or a 5xx.
+    """
+    try:
+        status = (await client.head(url)).status_code
+        if status in (403, 405, 501):
+            # Streamed so a server that ignores Range never sends the whole clip
+            async with client.stream("GET", url, headers={"Range": "bytes=0-0"}) as response:
+                status = response.status_code
+        ok = True if status < 400 else False if status in DEAD_STATUSES else None
+        return {"ok": ok, "status": status, "checked": time.time()}
+    except Exception as e:
+        return {"ok": None, "status": None, "error": type(e).__name__, "checked": time.time()}
+
+async def _check_all(urls):
+    import asyncio
+    import httpx  # Installed with anthropic; only needed once clips are validated
+
+    limits = httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_CONNECTIONS)
+    async with httpx.AsyncClient(limits=limits, timeout=_timeout(httpx), follow_redirects=True) as client:
+        results = await asyncio.gather(*(_check_one(client, url) for url in urls))
+    return dict(zip(urls, results))
+
+def validate_urls(urls, ttl=STATUS_TTL_SECONDS):
+    """
+    Checks that clip URLs are reachable with concurrent HEAD requests over one pooled
+    connection set. Definite results are cached on disk for `ttl` seconds, so only new,
+    stale or unknown URLs hit the network. Returns {url: {"ok", "status", "checked"}},
+    with `ok` None for a URL whose state is unknown; its link is kept.
+    """
+    import asyncio
+
+    with tracing.span("validate_clips", urls=len(urls)) as attrs:
+        statuses = _load_statuses()
+        now = time.time()
+        stale = [
+            url for url in dict.fromkeys(urls)
+            if statuses.get(url, {}).get("ok") is None or now - statuses[url]["checked"] > ttl
+        ]
+        if stale:
+            statuses.update(asyncio.run(_check_all(stale)))
+            _save_statuses({url: status for url, status in statuses.items() if status["ok"] is not None})
+        attrs["checked"] = len(stale)
+        attrs["cached"] = len(urls) - len(stale)
+        attrs["dead"] = sum(1 for url in urls if statuses[url]["ok"] is False)
+        attrs["unknown"] = sum(1 for url in urls if statuses[url]["ok"] is None)
+        return {url: statuses[url] for url in urls}
+
+# --- Thumbnails ---
+def thumbnail_path(url):
+    """Local cache path of a thumbnail URL."""
+    extension = os.path.splitext(url.split("?")[0])[1].lower() or ".jpg"
+    return os.path.join(CLIP_CACHE_DIR, "thumbs", hashlib.sha1(url.encode("utf-8")).hexdigest() + extension)
+
+async def _fetch_all(urls):
+    import asyncio
+    import httpx
+
+    async def fetch(client, url):
+        try:
+            response = await client.get(url)
+            response.raise_for_status()
+        except Exception:
+            return False
+        path = thumbnail_path(url)
+        with open(f"{path}.tmp", 'wb') as f:
+            f.write(response.content)
+        os.replace(f"{path}.tmp", path)
+        return True
+
+    limits = httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_CONNECTIONS)
+    async with httpx.AsyncClient(limits=limits, timeout=_timeout(httpx), follow_redirects=True) as client:
+        return await asyncio.gather(*(fetch(client, url) for url in urls))
+
+def prefetch_thumbnails(manifest):
+    """Downloads missing clip thumbnails into the local cache. Returns {ref: local path}."""
+    import asyncio
+
+    with tracing.span("prefetch_thumbnails") as attrs:
+        wanted = {entry["ref"]: entry["thumbnail"] for entry in manifest.values() if entry["thumbnail"]}
+        missing = [url for url in dict.fromkeys(wanted.values()) if not os.path.exists(thumbnail_path(url))]
+        if missing:
+            os.makedirs(os.path.join(CLIP_CACHE_DIR, "thumbs"), exist_ok=True)
+            try:
+                asyncio.run(_fetch_all(missing))
+            except Exception as e:
+                # Previews are optional; the report renders without them
+                tracing.mark_error(attrs, str(e))
+        attrs["thumbnails"] = len(wanted)
+        attrs["fetched"] = len(missing)
+        return {ref: thumbnail_path(url) for ref, url in wanted.items() if os.path.exists(thumbnail_path(url))}
+
+def start_prefetch(manifest):
+    """
+    Runs prefetch_thumbnails on a background thread so previews are on disk by the time
+    the report is ready. Returns a Future holding {ref: local path}.
+    """
+    import concurrent.futures
+    import contextvars
+
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+    # Copy the context so the prefetch span stays under the current report trace
+    future = executor.submit(contextvars.copy_context().run, prefetch_thumbnails, manifest)
+    executor.shutdown(wait=False)
+    return future
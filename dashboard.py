@@ -0,0 +1,129 @@
+import streamlit as st
+import pandas as pd
+
+import tracing
+
+# --- Page Configuration ---
+st.set_page_config(
+    page_title="Report Cost & Latency",
+    page_icon="📈",
+    layout="wide"
+)
+
+# --- Data Loading ---
+@st.cache_data(ttl=30)
+def load_span_frame(file_path):
+    """Flattens the exported span records into one row per span."""
+    records = tracing.load_spans(file_path)
+    if not records:
+        return pd.DataFrame()
+    df = pd.json_normalize(records)
+    df.columns = [c.replace("attributes.", "") for c in df.columns]
+    df["start"] = pd.to_datetime(df["start_time_unix_nano"], unit="ns")
+    df["status"] = df["status.code"]
+    return df
+
+def latency_table(df):
+    """p50/p95 latency and time-to-first-token per pipeline stage."""
+    table = df.groupby("name")["duration_ms"].agg(
+        calls="count",
+        p50_ms=lambda s: s.quantile(0.50),
+        p95_ms=lambda s: s.quantile(0.95),
+    )
+    if "ttft_ms" in df.columns:
+        table["ttft_p50_ms"] = df.groupby("name")["ttft_ms"].quantile(0.50)
+        table["ttft_p95_ms"] = df.groupby("name")["ttft_ms"].quantile(0.95)
+    if "retries" in df.columns:
+        table["retries"] = df.groupby("name")["retries"].sum()
+    for flag, column in (("hedged", "hedges"), ("timed_out", "timeouts")):
+        if flag in df.columns:
+            table[column] = df[flag].fillna(False).astype(bool).groupby(df["name"]).sum()
+    table["errors"] = df[df["status"] == "ERROR"].groupby("name").size()
+    return table.fillna(0).round(1).sort_values("p95_ms", ascending=False)
+
+def budget_table(df):
+    """Requested max_tokens against output actually written, per stage."""
+    budgeted = df.dropna(subset=["max_tokens"])
+    table = budgeted.groupby("name").agg(
+        calls=("max_tokens", "size"),
+        max_tokens_mean=("max_tokens", "mean"),
+        output_tokens_mean=("output_tokens", "mean"),
+        output_tokens_p95=("output_tokens", lambda s: s.quantile(0.95)),
+    )
+    table["truncated"] = (budgeted["stop_reason"] == "max_tokens").groupby(budgeted["name"]).sum()
+    table["stopped_at_marker"] = (budgeted["stop_reason"] == "stop_sequence").groupby(budgeted["name"]).sum()
+    return table.round(1)
+
+# --- Main Application UI ---
+st.title("📈 Report Cost & Latency")
+st.markdown(f"Reading spans from `{tracing.TRACE_FILE}`.")
+
+df = load_span_frame(tracing.TRACE_FILE)
+if df.empty:
+    st.info("No traces recorded yet. Generate a report in one of the apps first.")
+    st.stop()
+
+with st.sidebar:
+    st.header("🔎 Filters")
+    apps = sorted(df["app"].dropna().unique())
+    selected_apps = st.multiselect("Apps", apps, default=apps)
+    if st.button("🔄 Reload"):
+        load_span_frame.clear()
+        st.rerun()
+
+df = df[df["app"].isin(selected_apps) | df["app"].isna()]
+reports = df[df["name"] == "report"].copy()
+
+# --- Headline Numbers ---
+col1, col2, col3, col4 = st.columns(4)
+col1.metric("Reports", len(reports))
+if not reports.empty:
+    col2.metric("p50 report latency", f"{reports['duration_ms'].quantile(0.50) / 1000:.1f}s")
+    col3.metric("p95 report latency", f"{reports['duration_ms'].quantile(0.95) / 1000:.1f}s")
+    col4.metric("Total cost", f"${reports['cost_usd'].sum():.2f}")
+
+# --- Stage Latency ---
+st.subheader("⏱️ Latency by Stage")
+st.dataframe(latency_table(df), use_container_width=True)
+
+if "max_tokens" in df.columns:
+    st.subheader("✂️ Output Budgets by Stage")
+    st.dataframe(budget_table(df), use_container_width=True)
+
+if reports.empty:
+    st.stop()
+
+# --- Tokens Per Report ---
+st.subheader("🔢 Tokens per Report")
+token_cols = ["input_tokens", "output_tokens", "cache_creation_input_tokens", "cache_read_input_tokens"]
+by_mode = reports.groupby("mode")[token_cols + ["cost_usd"]].mean().round(1)
+by_mode["reports"] = reports.groupby("mode").size()
+st.dataframe(by_mode, use_container_width=True)
+
+# --- Cost Over Time ---
+st.subheader("💵 Cost by Mode over Time")
+reports["day"] = reports["start"].dt.floor("D")
+cost_by_day = reports.pivot_table(index="day", columns="mode", values="cost_usd", aggfunc="sum").fillna(0)
+st.line_chart(cost_by_day)
+
+st.subheader("🧾 Recent Reports")
+recent_cols = ["start", "app", "mode", "game", "duration_ms", "input_tokens", "output_tokens", "cost_usd", "status"]
+st.dataframe(
+    reports.sort_values("start", ascending=False)[[c for c in recent_cols if c in reports.columns]].head(50),
+    use_container_width=True
+)
+
+# --- Session Memory ---
+if "session_memory_bytes" in reports.columns:
+    memory = reports.dropna(subset=["session_memory_bytes"])
+    if not memory.empty:
+        st.subheader("🧠 Upload Memory by Session")
+        by_session = memory.groupby("session_id").agg(
+            reports=("session_memory_bytes", "size"),
+            peak_memory_mb=("session_memory_bytes", lambda s: s.max() / 1e6),
+            peak_spilled_mb=("session_spilled_bytes", lambda s: s.max() / 1e6),
+            evictions=("session_evictions", "max"),
+            peak_rss_mb=("process_rss_bytes", lambda s: s.max() / 1e6),
+            last_seen=("start", "max"),
+        ).round(1)
+        st.dataframe(by_session.sort_values("last_seen", ascending=False), use_container_width=True)
@@ -0,0 +1,244 @@
+import json
+import re
+
+import gamedata
+import tracing
+
+# --- Configuration ---
+QUARTER_SECONDS = 15 * 60
+CLOCK_FIELDS = ("GAME CLOCK", "CLOCK", "TIME", "TIME LEFT")
+# Kicks and tries that follow the real last snap of a drive
+_AFTER_DRIVE_TYPES = ("pat", "extra pt", "2 pt", "ko", "kickoff")
+
+_CLOCK_PATTERN = re.compile(r"^\s*(\d{1,2}):(\d{2})\s*$")
+
+# --- Field Helpers ---
+def _number(value):
+    """Parses a breakdownData number such as 12, "12", "-35" or "+4". Returns None otherwise."""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return value
+    try:
+        return float(str(value).strip().replace("+", "")) if value not in (None, "") else None
+    except ValueError:
+        return None
+
+def _int(value):
+    number = _number(value)
+    return int(number) if number is not None else None
+
+def field_position(yard_line):
+    """
+    Converts a YARD LN value (negative in the offense's own half, positive in the
+    opponent's) into yards from the offense's own goal line, 0-100.
+    """
+    yard_line = _number(yard_line)
+    if yard_line is None:
+        return None
+    return abs(yard_line) if yard_line < 0 else 100 - yard_line
+
+def yard_line_from_position(position):
+    """Inverse of field_position: yards from the own goal line back to the YARD LN convention."""
+    if position is None:
+        return None
+    position = int(round(position))
+    return -position if position < 50 else 100 - position
+
+def game_seconds(play):
+    """Seconds elapsed in regulation when the play was snapped, if the export has a game clock."""
+    quarter = _int(gamedata.breakdown_value(play, "QTR"))
+    for field in CLOCK_FIELDS:
+        match = _CLOCK_PATTERN.match(str(gamedata.breakdown_value(play, field) or ""))
+        if match and quarter:
+            remaining = int(match.group(1)) * 60 + int(match.group(2))
+            return (quarter - 1) * QUARTER_SECONDS + (QUARTER_SECONDS - remaining)
+    return None
+
+# --- Drive Results ---
+def _text(play, field):
+    return str(gamedata.breakdown_value(play, field) or "").lower()
+
+def drive_result(plays):
+    """
+    Classifies how a drive ended from its plays: Touchdown, Field Goal, Missed FG,
+    Turnover, Punt, Safety, Downs, or the last play's RESULT when nothing matches.
+    """
+    if any("td" in _text(p, "RESULT").split(", ") or "touchdown" in _text(p, "RESULT") for p in plays):
+        return "Touchdown"
+    snaps = [p for p in plays if not _text(p, "PLAY TYPE").startswith(_AFTER_DRIVE_TYPES)] or plays
+    last = snaps[-1]
+    play_type, result = _text(last, "PLAY TYPE"), _text(last, "RESULT")
+    if play_type.startswith("fg") or "field goal" in play_type:
+        return "Missed FG" if "no good" in result or "miss" in result or "block" in result else "Field Goal"
+    if "interception" in result or "fumble lost" in result or "turnover" in result:
+        return "Turnover"
+    if play_type.startswith("punt"):
+        return "Punt"
+    if "safety" in result:
+        return "Safety"
+    down, distance, gain = (_number(gamedata.breakdown_value(last, f)) for f in ("DN", "DIST", "GN/LS"))
+    if down == 4 and distance is not None and (gain or 0) < distance:
+        return "Downs"
+    return gamedata.breakdown_value(last, "RESULT") or "Unknown"
+
+# --- Drive Building ---
+def build_drives(plays):
+    """
+    Reconstructs drives from a game's plays, grouped by SERIES # (or possession when
+    the column is missing) with the same keys as gamedata.group_by_series. Each drive
+    records its team, quarters, start and end field position, yards, elapsed clock
+    time when the export has one, and how it ended.
+    """
+    drives = []
+    for number, (key, drive_plays) in enumerate(gamedata.group_by_series(plays), start=1):
+        first, last = drive_plays[0], drive_plays[-1]
+        gains = [_number(gamedata.breakdown_value(p, "GN/LS")) for p in drive_plays]
+        positions = [field_position(gamedata.breakdown_value(p, "YARD LN")) for p in drive_plays]
+        clock = [s for s in (game_seconds(p) for p in drive_plays) if s is not None]
+
+        # Tries and kicks after a score often carry no spot; end at the last spotted snap
+        end_position = None
+        for position, gain in zip(reversed(positions), reversed(gains)):
+            if position is not None:
+                end_position = min(100, max(0, position + (gain or 0)))
+                break
+
+        drives.append({
+            "key": key,
+            "number": number,
+            "team": gamedata.breakdown_value(first, "TEAM"),
+            "series": gamedata.breakdown_value(first, "SERIES #"),
+            "quarter": _int(gamedata.breakdown_value(first, "QTR")),
+            "end_quarter": _int(gamedata.breakdown_value(last, "QTR")),
+            "play_numbers": [gamedata.breakdown_value(p, "PLAY #") for p in drive_plays],
+            "plays": drive_plays,
+            "start_yard_line": gamedata.breakdown_value(first, "YARD LN"),
+            "start_position": positions[0],
+            "end_position": end_position,
+            "yards": int(sum(g for g in gains if g is not None)),
+            # Snap to snap: the last play's own run-off is not in the export
+            "seconds": clock[-1] - clock[0] if clock else None,
+            "result": drive_result(drive_plays),
+        })
+    return drives
+
+def play_index(drives):
+    """Maps each play number to the key of the drive it belongs to."""
+    index = {}
+    for drive in drives:
+        for play_number in drive["play_numbers"]:
+            number = _int(play_number)
+            if number is not None:
+                index[number] = drive["key"]
+    return index
+
+def summarize_drive(drive):
+    """The drive without its play records, for prompts and tables. Empty fields are dropped."""
+    summary = {
+        "drive": drive["key"],
+        "team": drive["team"],
+        "qtr": drive["quarter"],
+        "plays": len(drive["plays"]),
+        "first_play": drive["play_numbers"][0],
+        "last_play": drive["play_numbers"][-1],
+        "start": drive["start_yard_line"],
+        "end": yard_line_from_position(drive["end_position"]),
+        "yards": drive["yards"],
+        "time": f"{drive['seconds'] // 60}:{drive['seconds'] % 60:02d}" if drive["seconds"] is not None else None,
+        "result": drive["result"],
+    }
+    return {key: value for key, value in summary.items() if value not in (None, "")}
+
+def summary_line(drive):
+    """One compact JSON line describing a drive, placed ahead of its plays in serialized games."""
+    return json.dumps(summarize_drive(drive), ensure_ascii=False, separators=(",", ":"))
+
+def attach_drives(merged, drive_list):
+    """
+    Adds the locally built drive table to a merged extraction and tags each extracted
+    play with its drive key, so synthesis sees whole drives no chunk could see alone.
+    """
+    index = play_index(drive_list)
+    for play in merged["plays"]:
+        key = index.get(play.get("play_number"))
+        if key is not None:
+            play["drive"] = key
+    merged["drives"] = [summarize_drive(drive) for drive in drive_list]
+    return merged
+
+# --- Chunking ---
+def chunk_drives(header, drive_blocks, num_chunks):
+    """
+    Packs serialized drive blocks into at most `num_chunks` text chunks of similar size.
+    A drive is never split across chunks, and the game header line starts every chunk.
+    """
+    with tracing.span("chunk_drives", num_chunks=num_chunks, drives=len(drive_blocks)) as attrs:
+        total = sum(len(block) + 1 for block in drive_blocks)
+        target = total / max(num_chunks, 1)
+
+        chunks, current, current_length = [], [], 0
+        for block in drive_blocks:
+            # Close the chunk when this drive would overshoot more than it undershoots
+            overshoot = current_length + len(block) - target
+            if current and overshoot > target - current_length and len(chunks) < num_chunks - 1:
+                chunks.append("\n".join([header] + current))
+                current, current_length = [], 0
+            current.append(block)
+            current_length += len(block) + 1
+        if current or not chunks:
+            chunks.append("\n".join([header] + current))
+
+        attrs["chars"] = total
+        attrs["chunks"] = len(chunks)
+        return chunks
+
+def chunk_text(text, num_chunks):
+    """
+    Splits text with no drive structure into at most `num_chunks` chunks of similar
+    size, breaking at line ends where it can. Joined back together the chunks are `text`.
+    """
+    with tracing.span("chunk_text", num_chunks=num_chunks) as attrs:
+        target = max(1, -(-len(text) // max(num_chunks, 1)))
+        pieces = []
+        for line in text.splitlines(keepends=True):
+            # A line longer than a chunk (minified JSON) is cut by size
+            pieces.extend(line[i:i + target] for i in range(0, len(line), target))
+
+        chunks, current, current_length = [], [], 0
+        for piece in pieces:
+            if current and current_length + len(piece) > target and len(chunks) < num_chunks - 1:
+                chunks.append("".join(current))
+                current, current_length = [], 0
+            current.append(piece)
+            current_length += len(piece)
+        if current:
+            chunks.append("".join(current))
+
+        attrs["chars"] = len(text)
+        attrs["chunks"] = len(chunks)
+        return chunks
+
+def _covers(chunks, serialized):
+    """True when the chunks hold the whole serialized game, each header line aside."""
+    if not serialized["blocks"]:
+        return "".join(chunks) == serialized["text"]
+    prefix = serialized["header"] + "\n"
+    bodies = [chunk[len(prefix):] if chunk.startswith(prefix) else None for chunk in chunks]
+    return None not in bodies and "\n".join([serialized["header"]] + bodies) == serialized["text"]
+
+def chunk_game(serialized, num_chunks):
+    """
+    Chunks a game from projection.serialize_drives: whole drives when plays were found,
+    otherwise the unfamiliar export itself, split by line and size. Returns [] when the
+    chunks would not cover the whole game, so nothing is silently left out.
+    """
+    if serialized["blocks"]:
+        chunks = chunk_drives(serialized["header"], serialized["blocks"], num_chunks)
+    else:
+        chunks = chunk_text(serialized["text"], num_chunks)
+    if not _covers(chunks, serialized):
+        with tracing.span("chunk_game") as attrs:
+            tracing.mark_error(attrs, "chunks do not cover the serialized game")
+        return []
+    return chunks
@@ -1,15 +1,50 @@
 import streamlit as st
 import json
 import random
-import anthropic
-import math
 
+import budgets
+import drives
+import extraction
+import gamedata
+import hedging
+import livegame
+import pipeline
+import planner
+import projection
+import templates
+import tracing
+
+
+MODEL_NAME = planner.SYNTHESIS_MODEL  # Chunk count and map model are chosen per game by planner.plan_report
+LIVE_REFRESH_SECONDS = 30
+SYSTEM_PROMPT = "You are a world-class football analyst, similar to a Super Bowl-experienced commentator. Your analysis is sharp, insightful, and narrative-driven."
+
+# Progress and tab wording for the shared report steps in pipeline.py
+LABELS = {
+    "map_step": "Analyzing text chunk {part} of {total}...",
+    "streaming": "{done}/{total} chunks analyzed; the report streams below as they arrive...",
+    "map_start": "Starting analysis...",
+    "synthesize_all": "Synthesizing {count} reports...",
+    "subheader": "Analyzing Game: {away} at {home}",
+    "tab": "{name} Mode",
+    "failed": "Failed to generate the {name} report.",
+    "single": "Analyzing the full game in a single pass...",
+    "synthesize_one": "Synthesizing final report...",
+}
 
-ANTHROPIC_API_KEY = st.secrets["ANTHROPIC_KEY"]  
-MODEL_NAME = "claude-sonnet-4-20250514"  # keep as-is
+# Versioned report templates under prompts/, read once per process
+PROMPT_TEMPLATES = {
+    "Simple": "eggball/simple.v1.md",
+    "Football": "eggball/football.v1.md",
+    "Tactical": "eggball/tactical.v1.md",
+}
 
-MODEL_NAME = "claude-sonnet-4-20250514"  # Kept your specified model
-NUM_CHUNKS = 3  # Changed to 3 chunks
+# breakdownData columns each report type reads; everything else is dropped before serializing
+REPORT_FIELDS = {
+    "Simple": projection.fields_for(projection.BASE_FIELDS, projection.DESCRIPTION_FIELDS),
+    "Football": projection.fields_for(projection.BASE_FIELDS, projection.FORMATION_FIELDS),
+    "Tactical": projection.fields_for(projection.BASE_FIELDS, projection.FORMATION_FIELDS, projection.DEFENSE_FIELDS, projection.DESCRIPTION_FIELDS),
+}
 
 # --- Data Loading ---
 @st.cache_data
@@ -17,419 +52,335 @@ def load_games_from_json(file_path):
     """
     Loads a list of game dictionaries from a file containing comma-separated JSON objects.
     """
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read().strip()
-        if not content:
-            st.error("Error: The JSON file is empty.")
+    with tracing.span("load_games_from_json", file_path=file_path) as attrs:
+        try:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                content = f.read().strip()
+            attrs["bytes"] = len(content)
+            if not content:
+                st.error("Error: The JSON file is empty.")
+                tracing.mark_error(attrs, "empty file")
+                return None
+            games_data = gamedata.parse_games(content)
+            if not isinstance(games_data, list):
+                st.error("Error: The JSON file should contain a list of game objects.")
+                tracing.mark_error(attrs, "not a list")
+                return None
+            attrs["games"] = len(games_data)
+            return games_data
+        except FileNotFoundError:
+            st.error(f"Error: The file '{file_path}' was not found.")
+            tracing.mark_error(attrs, "file not found")
             return None
-        if not content.startswith('['):
-            if content.endswith(','):
-                content = content[:-1]
-            json_string = f"[{content}]"
-        else:
-            json_string = content
-        games_data = json.loads(json_string)
-        if not isinstance(games_data, list):
-            st.error("Error: The JSON file should contain a list of game objects.")
+        except json.JSONDecodeError as e:
+            st.error(f"Error decoding JSON: {e}. Please check the file's format.")
+            tracing.mark_error(attrs, str(e))
             return None
-        return games_data
-    except FileNotFoundError:
-        st.error(f"Error: The file '{file_path}' was not found.")
-        return None
-    except json.JSONDecodeError as e:
-        st.error(f"Error decoding JSON: {e}. Please check the file's format.")
-        return None
-
-# --- New Helper Function: String-wise Data Chunking ---
-def split_game_stringwise(game_data, num_chunks=3):
-    """
-    Converts the entire game data dictionary to a JSON string and splits that string
-    into a specified number of chunks.
-    """
-    try:
-        # Convert the entire Python dictionary to a nicely formatted JSON string
-        full_game_string = json.dumps(game_data, indent=2)
-    except TypeError as e:
-        st.error(f"Error converting game data to string: {e}")
-        return []
-
-    text_chunks = []
-    total_length = len(full_game_string)
-    chunk_size = math.ceil(total_length / num_chunks)
-
-    for i in range(num_chunks):
-        start_index = i * chunk_size
-        end_index = start_index + chunk_size
-        # Ensure we don't go past the end of the string
-        chunk = full_game_string[start_index:end_index]
-        if chunk:  # Only add non-empty chunks
-            text_chunks.append(chunk)
-
-    return text_chunks
 
 # --- Anthropic API Interaction ---
-def generate_partial_analysis(client, text_chunk, part_num, total_parts):
-    """Generates an analysis for a single string chunk of the game data."""
+def generate_partial_analysis(client, text_chunk, part_num, total_parts, model=MODEL_NAME):
+    """
+    Extracts typed records (notable plays, formations, situations, tendencies) from a
+    single chunk of the game data. Results are cached on disk by model, prompt and chunk.
+    """
     prompt = f"""
     You are analyzing a large JSON file representing a football game. The file has been split into several parts because of its size.
     This is **Part {part_num} of {total_parts}**.
     keep team names !
 
-    Your task is to summarize the key events, plays, and data points present *only* in the following text snippet.keep video urls, off form (offensive formation and def formation too) for plays they are important The snippet may be incomplete JSON.
-    Do not make assumptions about the whole game. Focus strictly on summarizing the information contained in this chunk of text.
+    Record the key plays, formations, situations and tendencies present *only* in the following text snippet using the record_game_chunk tool.keep video clip ids, off form (offensive formation and def formation too) for plays they are important. The first line holds the game details and each following line is a drive summary or one play.
+    {projection.DRIVE_NOTE}
+    Do not make assumptions about the whole game. Focus strictly on the information contained in this chunk of text.
+    {projection.CLIP_REF_NOTE}
     """
-    # The 'game_data' parameter is now the raw text chunk itself
-    return call_anthropic_api(client, prompt, raw_text_chunk=text_chunk)
+    return pipeline.extract_cached(client, prompt, text_chunk, model, system=SYSTEM_PROMPT)
 
-def synthesize_analyses(client, partial_analyses, original_prompt):
-    """Takes multiple partial analyses and synthesizes them into a single, final report."""
+def synthesize_analyses(client, partial_analyses, original_prompt, model=MODEL_NAME, drive_list=None, on_text=None,
+                        total_parts=None, prefill=None, should_stop=None):
+    """Merges the per-chunk extractions locally and synthesizes them into a single, final report."""
+    context = pipeline.synthesis_context(partial_analyses, drive_list, total_parts)
     synthesis_prompt = f"""
-    You are a world-class football analyst. I have provided you with {len(partial_analyses)} separate, chronologically ordered summaries of a single football game's data.
-    Your task is to synthesize these parts into ONE single, cohesive, and comprehensive final report.
+    You are a world-class football analyst. I have provided you with a dataset merged from {context["parts"]} chronologically ordered parts of a single football game's data.
+    It lists every drive of the game, the notable plays in order (tagged with their drive), formation usage counts, situational conversion counts and observed tendencies.
+    Your task is to turn this dataset into ONE single, cohesive, and comprehensive final report.
     The final report must fulfill the user's original request, which was: "{original_prompt}"
-
-    Here are the partial summaries:
-    ---
+    {projection.CLIP_REF_NOTE}
+    {context["notes"]}
+    {budgets.END_NOTE}
+
+    Here is the merged dataset:
+    ```json
+    {context["dataset"]}
+    ```
     """
-    for i, analysis in enumerate(partial_analyses):
-        synthesis_prompt += f"PART {i+1} SUMMARY:\n{analysis}\n---\n"
     
-    # This call only works with the text analyses
-    return call_anthropic_api(client, synthesis_prompt, raw_text_chunk=None)
-
-def call_anthropic_api(client, prompt, raw_text_chunk=None):
-    """A generic function to call the Anthropic API with raw text."""
-    if raw_text_chunk:
-        full_content = f"{prompt}\n\nHere is the data chunk to analyze:\n```text\n{raw_text_chunk}\n```"
-    else:
-        full_content = prompt
-
-    try:
-        message = client.messages.create(
-            model=MODEL_NAME,
-            max_tokens=4096,
-            system="You are a world-class football analyst, similar to a Super Bowl-experienced commentator. Your analysis is sharp, insightful, and narrative-driven.",
-            messages=[{"role": "user", "content": full_content}]
-        )
-        return message.content[0].text
-    except anthropic.APIError as e:
-        st.error(f"Anthropic API Error: {e}")
-        return None
-    except Exception as e:
-        st.error(f"An unexpected error occurred: {e}")
-        return None
-
-# --- Main Application UI ---
-def main():
-    st.title("🏈 Football Game Analytics Assistant")
-    st.markdown("This app analyzes massive game files by splitting the raw text into **3 chunks**, summarizing each, and then synthesizing a final report.")
-    st.markdown("---")
-
-    file_path = 'footballdict.json'
-    games_list = load_games_from_json(file_path)
-    if not games_list:
-        st.warning("Could not load game data. Please check the file and error messages above.")
-        return
-
-    st.sidebar.header("⚙️ Analysis Options")
-    prompt_mode = st.sidebar.radio(
-        "Choose Final Report Type:",
-        ("Simple", "Football", "Tactical")
+    # This call only works with the merged records
+    return call_anthropic_api(
+        client, synthesis_prompt, raw_text_chunk=None, stage=context["stage"], model=model,
+        on_text=on_text, prefill=prefill, should_stop=should_stop, budget=budgets.report_budget(original_prompt, model)
     )
 
-    prompts = {
-        "Simple": """Play #{{NUMBER}} — {{PLAY TYPE}}, {{Quarter}}: From {{Down & Distance}} at {{Field Position}}, {{Key Action}};  Watch: {{desc}} ({{URL}}).
-""",
-        "Football": """ Name the teams and date 
-        # Football Game Analysis: Summary and Pivotal Plays Identification
-
-## Optimized Prompt Template
-
-**Analyze this football game JSON data to identify the 8-12 most tactically significant plays. Focus on plays that had the greatest impact on game momentum, field position, or scoring opportunities. For each pivotal play, provide:**
-
-### Required Analysis Format:
-
-
-**Play #[NUMBER] - [PLAY TYPE] ([Quarter] Quarter)**
-- **Situation**: [Down & Distance] at [Field Position]
-- **Key Action**: [Brief description of what happened]
-- **Tactical Significance**: [Why this play was pivotal]
-- **formation**: off formation]
-- **Video**: [Clip Link with descriptive text]
-
----
-
-## Pivotal Play Identification Criteria
-
-### 🏈 **Priority 1: Game-Changing Plays**
-- **Scoring Plays**: Touchdowns, field goals, extra points
-- **Turnovers**: Fumbles, interceptions, failed 4th down conversions
-- **Big Plays**: Gains/losses of 20+ yards
-- **Red Zone Plays**: Within 20 yards of goal line
-
-### ⚡ **Priority 2: Momentum Shifters**
-- **Fourth Down Attempts**: Successful conversions or failures
-- **Sacks**: Significant pressure plays (loss of 10+ yards)
-- **Key Penalties**: Major yardage impact or automatic first downs
-- **Goal Line Stands**: Defensive stops near the end zone
-
-### 🎯 **Priority 3: Strategic Moments**
-- **Third Down Conversions**: Key conversion attempts
-- **Two-Minute Drill**: End of half/game situations
-- **Fake Plays**: Punts, field goals, or trick plays
-- **Formation Changes**: Unusual offensive/defensive alignments
-
----
-
-## Data Extraction Guidelines
-
-### 🔍 **Key Fields to Analyze:**
-```
-breakdownData: {
-  "PLAY #": [Play sequence number]
-  "QTR": [Quarter 1-4]
-  "YARD LN": [Field position, negative = own territory]
-  "DN": [Down 1-4]
-  "DIST": [Distance for first down]
-  "PLAY TYPE": [Run, Pass, KO, Punt, etc.]
-  "RESULT": [Rush, Complete, TD, Fumble, etc.]
-  "GN/LS": [Yards gained/lost]
-  "TEAM": [Offensive team]
-  "OPP TEAM": [Defensive team]
-}
-```
-
-### 📊 **Tactical Significance Indicators:**
-
-**High Impact Situations:**
-- Field position inside 30-yard lines (red zone/deep territory)
-- Third/Fourth down with short distance (3 yards or less)
-- Large gain/loss differential (15+ yards from expected)
-- Score-affecting plays (T
-Ds, turnovers, field position flips)
-
-**Formation Analysis:**
-- Unusual formations (Empty, Trips, Wing formations)
-- Personnel packages (10p, 11p, 12p indicating receivers vs. tight ends)
-- Backfield alignments (Pistol, Shotgun, I-formation)
-
----
-
-## Video Link Format
-
-**Template for clip links:**
-```markdown
-**[📹 Watch Play](VIDEO_URL)** - [Brief description of key moment]
-```
-
-**Example:**
-```markdown
-**[📹 75-Yard Touchdown Run](https://vc.thorhudl.com/clip123)** - Breakaway run from the 25-yard line
-```
-
----
-
-## Sample Analysis Output
- 
-### Play #10 - Power Run (1st Quarter)
-- **Situation**: 1st & 30 at own 25-yard line  
-- **Key Action**: 75-yard touchdown run by #5 to the left
-- **Tactical Significance**: Completely flipped field position and momentum after penalties backed team up
-- **Impact**: First touchdown of game, showcased explosive running ability
-- **Video**: **[📹 Watch 75-Yard TD](https://vc.thorhudl.com/1012651/83403/87394636/64a641a7-098a-457e-b225-27fa6e8775ed_1080_3000.mp4)** - Power run breaks contain for house call
-
-### Play #19 - Fumble (1st Quarter)
-- **Situation**: 1st & 15 at opponent 41-yard line
-- **Key Action**: Pin & pull run results in fumble
-- **Tactical Significance**: Turnover in prime scoring position - major momentum shift
-- **Impact**: Prevented likely scoring drive, gave opponent short field
-- **Video**: **[📹 Watch Fumble](https://vc.thorhudl.com/1012651/83403/87394636/d7c580d2-8291-442e-ba85-b224fb1fdf58_1080_3000.mp4)** - Ball security breakdown on sweep play
-
----
-
-## Analysis Efficiency Tips
-
-### ⚡ **Quick Scan Method:**
-1. **First Pass**: Look for RESULT = "TD", "Fumble", "Sack", "Penalty"
-2. **Second Pass**: Check GN/LS for values >20 or <-10
-3. **Third Pass**: Identify DN = 4 (fourth down situations)
-4. **Fourth Pass**: Check YARD LN for red zone plays (YARD LN > 20 or < -20)
-
-### 🎯 **Priority Filtering:**
-- Skip routine plays (short gains on early downs in middle field)
-- Focus on plays where RESULT ≠ expected outcome
-- Highlight plays with multiple tactical elements (4th down + red zone)
-
-### 📈 **Context Building:**
-- Track series progression (consecutive plays with same SERIES #)
-- Note team momentum shifts (consecutive positive/negative plays)
-- Identify drive-ending plays (TD, turnover, punt, field goal)
-
----
-
-## Output Requirements
-
-**Deliverable**: 15-20 play analysis covering the most tactically significant moments
-**Format**: Structured markdown with clear headers and video links
-**Focus**: Strategic impact rather than statistical compilation
-**Tone**: Analytical but accessible to coaches and players""",
-        "Tactical": """Got it. You want a **merged template** that blends the clarity of the “pivotal play identification” format with the **zone/field-based tactical storytelling** of the scouting report—so the output reads like a **narrative match story with embedded video evidence**, while still retaining structured tactical insights. Here’s an improved **Prompt Template** that achieves those goals:
-
----
-
-# 📖 Tactical Match Story with Video Anchors
-
-**Analyze this football game JSON data and produce a sequential, narrative-driven match story. Identify 8–12 of the most tactically significant plays, but embed them into a flowing narrative that highlights how momentum shifted, which zones were targeted, and what tactical decisions defined the game.**
-
-The report should:
-
-* Tell the story of the match in order (from kickoff to final whistle).
-* Highlight **zones of attack/defense** (e.g., “right flat,” “deep middle,” “boundary edge”).
-* Link **video clips** naturally into the narrative (for easy watch-along).
-* Explain the **tactical meaning** of each play: why it mattered, what it showed about tendencies, how it shaped the next series.
-* End with **macro takeaways** (offensive/defensive identity, red-zone efficiency, 3rd/4th down patterns).
-
----
-
-## 📝 Narrative Structure
-
-### 1. **Opening Frame (Kickoff → Early Drives)**
-
-Set the stage: initial formations, tempo, and any early statement plays.
-Embed the first 2-3 pivotal clips.
-
-### 2. **Momentum Shifts (Middle Quarters)**
-
-Tell the story of how one side gained control or clawed back.
-Highlight: turnovers, explosive plays, red-zone attempts.
-Describe tactical zones (e.g., “attacked left seam repeatedly”).
-Embed 3–5 video clips here.
-
-### 3. **Climactic Sequences (Late Drives / Key Stops)**
-
-Cover defining moments that sealed the outcome: goal-line stands, fourth-down gambles, long TDs, etc.
-Embed final 3–4 video clips.
-
-### 4. **Aftermath & Tactical Themes**
-
-Summarize tendencies revealed:
-
-* **Where the game was won/lost** (field zones, play types).
-* **Efficiency insights** (3rd downs, red zone, explosive plays).
-* **Next-game scouting note** (what this team will likely lean on again).
-
----
+def analyze_in_single_call(client, game_text, original_prompt, model=MODEL_NAME, on_text=None):
+    """Analyzes a game small enough to fit in one request, skipping the map/reduce round trip."""
+    prompt = f"""
+    You are analyzing a complete football game. The first line holds the game details and each following line is a drive summary or one play.
+    {projection.DRIVE_NOTE}
+    keep team names !
+    Your report must fulfill the following request: "{original_prompt}"
+    {projection.CLIP_REF_NOTE}
+    {budgets.END_NOTE}
+    """
+    return call_anthropic_api(
+        client, prompt, raw_text_chunk=game_text, stage="single", model=model, on_text=on_text,
+        budget=budgets.report_budget(original_prompt, model)
+    )
 
-## 🎥 Pivotal Play Formatting Inside the Narrative
+def call_anthropic_api(client, prompt, **kwargs):
+    """pipeline.call_anthropic_api in the commentator's voice."""
+    return pipeline.call_anthropic_api(client, prompt, system=SYSTEM_PROMPT, **kwargs)
 
-When describing each play, weave it in like this (instead of bullet points):
+# --- Live Game Mode ---
+def analyze_drive(client, drive_text, drive_key, model=MODEL_NAME):
+    """Extracts typed records for one completed drive of a live game, cached like chunk extractions."""
+    prompt = f"""
+    You are following a football game while it is being played. The following lines are drive {drive_key}: the first line summarizes the drive and each following line is one play.
+    keep team names !
 
-> “On **3rd & 8 from their own 40**, the offense dialed up a **trips-right mesh**. Quarterback #12 found the slot man streaking into the left seam for 22 yards—beating zone coverage and flipping field position.
-> **[📹 Watch Seam Conversion](VIDEO_URL)** – The clip shows how the weak-side linebacker hesitates, leaving the seam wide open.”
+    Record the key plays, formations, situations and tendencies of this drive using the record_game_chunk tool.keep video clip ids, off form (offensive formation and def formation too) for plays they are important.
+    {projection.CLIP_REF_NOTE}
+    """
+    return pipeline.extract_cached(client, prompt, drive_text, model, system=SYSTEM_PROMPT)
 
-Each play should include:
+def continue_narrative(client, state, new_records, new_drives, original_prompt, model=MODEL_NAME):
+    """
+    Writes only the narrative for newly completed drives and the revised closing themes;
+    livegame.apply_update appends the one and replaces the other, so each update's
+    output stays the size of the new drives rather than the whole story.
+    """
+    prompt = f"""
+    You are writing a live match story while the game is still being played. The story follows this template: "{original_prompt}"
+    {projection.CLIP_REF_NOTE}
 
-* Situation (down, distance, field position)
-* Play type / formation / zone of attack
-* Tactical meaning (momentum, mismatch, trend)
-* **Embedded video link**
+    The story so far (empty before the first update):
+    ---
+    {livegame.story_context(state)}
+    ---
 
----
+    Its closing momentum and tactical-themes sections as they stand:
+    ---
+    {state["themes"]}
+    ---
 
-## 🔑 Analysis Criteria
+    Records for the drives completed since the last update:
+    ```json
+    {extraction.render_dataset(new_records)}
+    ```
 
-### **High Priority (Game-Changers)**
+    Write only the narrative for these new drives, in order, continuing from where the story stops. Do not repeat or rewrite the story so far.
+    Then write the line {livegame.THEMES_MARKER} followed by the closing momentum and tactical-themes sections, revised where the new drives change them and otherwise as they stand.
+    {budgets.END_NOTE}
+    """
+    return call_anthropic_api(
+        client, prompt, raw_text_chunk=None, stage="reduce", model=model,
+        budget=budgets.update_budget(new_drives, model)
+    )
 
-* Touchdowns, turnovers, goal-line stands
-* Explosive gains (20+ yards)
-* Fourth-down attempts
+def run_live_update(client, feed_path, original_prompt):
+    """
+    Reads plays appended to the feed, analyzes only the drives that closed since the
+    last update and folds them into the stored narrative. Returns the saved state.
+    """
+    state = livegame.load_state(feed_path)
+    with tracing.start_trace("eggball", mode="Live", feed_path=feed_path) as report_attrs:
+        skipped_before = state["lines_skipped"]
+        try:
+            new_plays = livegame.read_new_plays(feed_path, state)
+        except (OSError, ValueError) as e:
+            st.error(f"Error reading the play feed: {e}")
+            tracing.mark_error(report_attrs, str(e))
+            return state
+        report_attrs["new_plays"] = len(new_plays)
+        if state["lines_skipped"] > skipped_before:
+            st.warning(f"Skipped {state['lines_skipped'] - skipped_before} malformed feed line(s); the latest: {state['skipped_lines'][-1]['error']}")
+
+        clip_refs = projection.ClipRefs(state["clip_urls"])
+        drive_groups = gamedata.group_by_series(state["plays"])
+        # Built from every play so each drive keeps its real key and number in the game
+        drive_table = {drive["key"]: drive for drive in drives.build_drives(state["plays"])}
+        pending = livegame.drives_to_analyze(state, drive_groups)
+        report_attrs["drives_analyzed"] = len(pending)
+        for drive_key, plays in pending:
+            drive_text = projection.drive_block(drive_table[drive_key], REPORT_FIELDS["Tactical"], clip_refs)
+            try:
+                record = analyze_drive(client, drive_text, drive_key, model=planner.MAP_MODEL)
+            except hedging.StageTimeout:
+                record = None
+            if record is None:
+                st.error(f"Failed to analyze drive {drive_key}. It will be retried on the next update.")
+                tracing.mark_error(report_attrs, f"drive {drive_key} failed")
+                break
+            state["drive_records"][drive_key] = {"plays": len(plays), "record": record}
+        state["clip_urls"] = clip_refs.urls
+
+        to_narrate = livegame.drives_to_narrate(state, drive_groups)
+        if to_narrate:
+            new_records = extraction.merge_extractions([state["drive_records"][key]["record"] for key, _ in to_narrate])
+            drives.attach_drives(new_records, [drive_table[key] for key, _ in to_narrate])
+            update = continue_narrative(client, state, new_records, len(to_narrate), original_prompt)
+            if update and update.endswith(pipeline.TRUNCATED_NOTE):
+                # A cut-off update is never stored; its drives are narrated again next time
+                st.warning("The story update was cut off before it finished. It will be written again on the next update.")
+                tracing.mark_error(report_attrs, "narrative update cut off")
+            elif update:
+                livegame.apply_update(state, update)
+                for key, _ in to_narrate:
+                    state["narrated"][key] = state["drive_records"][key]["plays"]
+
+        livegame.save_state(state)
+    return state
+
+def render_live_mode(original_prompt):
+    """Sidebar controls and the auto-refreshing panel for watching a live play feed."""
+    st.sidebar.markdown("---")
+    feed_path = st.sidebar.text_input("Play feed file (.jsonl, .csv or .json):", value="live_feed.jsonl")
+    watching = st.sidebar.toggle(f"👀 Watch feed (every {LIVE_REFRESH_SECONDS}s)", value=False)
+    col1, col2 = st.sidebar.columns(2)
+    if col1.button("🏁 Mark final"):
+        state = livegame.load_state(feed_path)
+        state["final"] = True
+        livegame.save_state(state)
+    if col2.button("♻️ Reset"):
+        livegame.reset_state(feed_path)
+
+    client = pipeline.create_client()
+    if client is None:
+        return
 
-### **Medium Priority (Momentum Shifters)**
+    @st.fragment(run_every=LIVE_REFRESH_SECONDS if watching else None)
+    def live_panel():
+        if watching or st.button("🔄 Update now", type="primary"):
+            state = run_live_update(client, feed_path, original_prompt)
+        else:
+            state = livegame.load_state(feed_path)
+
+        drive_list = drives.build_drives(state["plays"])
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Plays received", len(state["plays"]))
+        col2.metric("Drives", len(drive_list))
+        col3.metric("Drives in story", len(state["narrated"]))
+        if drive_list:
+            with st.expander("Drive chart"):
+                st.dataframe([drives.summarize_drive(drive) for drive in drive_list], hide_index=True)
+
+        if state["narrative"]:
+            clip_refs = projection.ClipRefs(state["clip_urls"])
+            st.markdown("---")
+            st.subheader("📡 Live Tactical Match Story" + (" (Final)" if state["final"] else ""))
+            st.markdown(clip_refs.expand(state["narrative"]))
+        else:
+            st.info("Waiting for the first completed drive.")
 
-* Red zone plays (success/failure)
-* 3rd & long conversions
-* Big sacks or penalties flipping field position
+    live_panel()
 
-### **Low Priority (Strategic Patterns)**
+# --- Multi-Report Fan-Out ---
+def generate_all_reports(client, game, modes, validate_clips=True, prefetch_previews=False):
+    """Builds several report types from one pass over the game, one tab per mode."""
+    def write_single(mode, game_text, model, emit):
+        return analyze_in_single_call(client, game_text, templates.load(PROMPT_TEMPLATES[mode]), model=model, on_text=emit)
 
-* Play direction tendencies
-* Repeated zone attacks (e.g., right seam, outside runs)
-* Personnel/formation wrinkles
+    def map_chunk(chunk, part_num, total_parts, model):
+        return generate_partial_analysis(client, chunk, part_num, total_parts, model=model)
 
----
+    def write_report(mode, extractions, model, drive_list, emit):
+        return synthesize_analyses(
+            client, extractions, templates.load(PROMPT_TEMPLATES[mode]), model=model, drive_list=drive_list, on_text=emit
+        )
 
-## ✅ Output Requirements
+    pipeline.generate_all_reports(
+        "eggball", game, modes, REPORT_FIELDS, LABELS, write_single, map_chunk, write_report,
+        validate_clips=validate_clips, prefetch_previews=prefetch_previews
+    )
 
-* **Length**: 600–800 words, \~8–12 embedded plays.
-* **Tone**: Analytical but readable—like a coach walking through film with staff.
-* **Focus**: Storytelling + tactical teaching,+ video links
-* **Deliverable**: Markdown with narrative sections and video links inline.
+# --- Main Application UI ---
+def main():
+    st.title("🏈 Football Game Analytics Assistant")
+    st.markdown("This app analyzes game files in a single pass when they are small, or by splitting the raw text into chunks sized to the game, summarizing each, and then synthesizing a final report.")
+    st.markdown("---")
 
----
+    st.sidebar.header("⚙️ Analysis Options")
+    data_source = st.sidebar.radio(
+        "Game Source:",
+        ("Game Archive", "Live Feed")
+    )
+    if data_source == "Live Feed":
+        prompt_mode = "Tactical"  # Live updates extend the Tactical match story drive by drive
+    else:
+        prompt_mode = st.sidebar.radio(
+            "Choose Final Report Type:",
+            ("Simple", "Football", "Tactical")
+        )
+        generate_all = st.sidebar.toggle("📚 Generate several report types at once", value=False)
+        if generate_all:
+            selected_modes = st.sidebar.multiselect("Report types:", list(PROMPT_TEMPLATES), default=list(PROMPT_TEMPLATES))
 
-👉 In short:
-The template now **marries structured data with sequential storytelling**—turning isolated play analysis into a flowing **match film breakdown with zones + tactical lessons**.
+    if data_source == "Live Feed":
+        render_live_mode(templates.load(PROMPT_TEMPLATES[prompt_mode]))
+        return
 
----
+    validate_clips = st.sidebar.checkbox("✅ Validate clip links", value=True)
+    prefetch_previews = st.sidebar.checkbox("🖼️ Prefetch clip previews", value=False)
+    speculate = st.sidebar.checkbox("⚡ Start the report before every chunk is back", value=False)
 
-Do you want me to **write a sample “mini-report” (with 3 plays, narrative style, zone targeting, and fake video links)** so you can see exactly how it reads in practice?
-""" }
+    file_path = 'footballdict.json'
+    games_list = load_games_from_json(file_path)
+    if not games_list:
+        st.warning("Could not load game data. Please check the file and error messages above.")
+        return
 
     if st.button("🎲 Generate String Chunks & Analyze", type="primary"):
-        if not ANTHROPIC_API_KEY or "YOUR_API_KEY" in ANTHROPIC_API_KEY:
-            st.error("Please provide a valid Anthropic API key at the top of the script.")
+        client = pipeline.create_client()
+        if client is None:
             return
 
-        try:
-            client = anthropic.Anthropic(api_key=ANTHROPIC_API_KEY)
-        except Exception as e:
-            st.error(f"Failed to initialize Anthropic client: {e}")
+        if generate_all:
+            if not selected_modes:
+                st.warning("Select at least one report type.")
+                return
+            generate_all_reports(client, random.choice(games_list), selected_modes, validate_clips, prefetch_previews)
             return
 
-        random_game = random.choice(games_list)
-        home_team = random_game.get('home_team', 'N/A')
-        away_team = random_game.get('away_team', 'N/A')
-        st.subheader(f"Analyzing Game: {away_team} at {home_team}")
-        
-        # 1. Split the game data into raw text chunks
-        text_chunks = split_game_stringwise(random_game, NUM_CHUNKS)
-        if not text_chunks:
-            st.error("Failed to split game data into text chunks. Aborting.")
-            return
-            
-        total_steps = len(text_chunks) + 1  # N chunks + 1 synthesis step
-        progress_bar = st.progress(0, text="Starting analysis...")
+        with tracing.start_trace("eggball", mode=prompt_mode) as report_attrs, hedging.report_deadline():
+            random_game = random.choice(games_list)
+            home_team = random_game.get('home_team', 'N/A')
+            away_team = random_game.get('away_team', 'N/A')
+            st.subheader(f"Analyzing Game: {away_team} at {home_team}")
+            report_attrs["game"] = f"{away_team} at {home_team}"
         
-        # 2. "Map" Step: Analyze each chunk individually
-        partial_analyses = []
-        for i, chunk in enumerate(text_chunks):
-            progress_text = f"Step {i+1}/{total_steps}: Analyzing text chunk {i+1} of {len(text_chunks)}..."
-            progress_bar.progress((i + 1) / total_steps, text=progress_text)
-            
-            analysis = generate_partial_analysis(client, chunk, i + 1, len(text_chunks))
-            if analysis:
-                partial_analyses.append(analysis)
-            else:
-                st.error(f"Failed to analyze chunk {i+1}. Aborting.")
-                return
+            original_prompt = templates.load(PROMPT_TEMPLATES[prompt_mode])
 
-        # 3. "Reduce" Step: Synthesize the final report
-        progress_text = f"Step {total_steps}/{total_steps}: Synthesizing final report..."
-        progress_bar.progress(total_steps / total_steps, text=progress_text)
-        
-        original_prompt = prompts[prompt_mode]
-        final_report = synthesize_analyses(client, partial_analyses, original_prompt)
-        
-        progress_bar.empty() # Clear the progress bar
+            def write_single(game_text, model):
+                return analyze_in_single_call(client, game_text, original_prompt, model=model)
 
-        # 4. Display the final result
-        if final_report:
-            st.markdown("---")
-            st.subheader(f"✅ Final Synthesized Report ({prompt_mode} Mode)")
-            st.markdown(final_report)
-        else:
-            st.error("Failed to generate the final synthesized report.")
+            def map_chunk(chunk, part_num, total_parts, model):
+                return generate_partial_analysis(client, chunk, part_num, total_parts, model=model)
+
+            def write_report(extractions, model, drive_list, **stream_options):
+                return synthesize_analyses(client, extractions, original_prompt, model=model, drive_list=drive_list, **stream_options)
+
+            result = pipeline.run_report(
+                random_game, REPORT_FIELDS[prompt_mode], LABELS, write_single, map_chunk, write_report, report_attrs,
+                speculate=speculate, validate_clips=validate_clips, prefetch_previews=prefetch_previews
+            )
+            if result is None:
+                return
+            if result["report"]:
+                st.markdown("---")
+                st.subheader(f"✅ Final Synthesized Report ({prompt_mode} Mode)")
+                st.markdown(result["report"])
+                pipeline.render_clip_gallery(result["clips"], result["previews"])
+            else:
+                st.error("Failed to generate the final synthesized report.")
+                tracing.mark_error(report_attrs, "synthesis failed")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,193 @@
+import hashlib
+import json
+import os
+
+# --- Configuration ---
+CACHE_DIR = os.environ.get("FOOTBALL_EXTRACTION_CACHE", os.path.join(".cache", "extractions"))
+# Set on an extraction whose tool call was still cut off at the output limit
+TRUNCATED = "_truncated"
+
+_NULLABLE_INT = {"type": ["integer", "null"]}
+_NULLABLE_STR = {"type": ["string", "null"]}
+
+# --- Extraction Schema ---
+EXTRACTION_TOOL = {
+    "name": "record_game_chunk",
+    "description": "Record the structured facts found in one chunk of a football game's play-by-play data.",
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            "teams": {
+                "type": "array",
+                "items": {"type": "string"},
+                "description": "Team names seen in this chunk.",
+            },
+            "plays": {
+                "type": "array",
+                "description": "Notable plays only: scores, turnovers, gains of 20+ or losses of 10+, 3rd and 4th downs, red zone snaps, key penalties, unusual formations.",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "play_number": {"type": "integer"},
+                        "quarter": _NULLABLE_INT,
+                        "series": _NULLABLE_INT,
+                        "offense": _NULLABLE_STR,
+                        "down": _NULLABLE_INT,
+                        "distance": _NULLABLE_INT,
+                        "yard_line": _NULLABLE_INT,
+                        "play_type": {"type": "string"},
+                        "result": {"type": "string"},
+                        "gain": _NULLABLE_INT,
+                        "off_formation": _NULLABLE_STR,
+                        "def_formation": _NULLABLE_STR,
+                        "personnel": _NULLABLE_STR,
+                        "clips": {"type": "array", "items": {"type": "string"}},
+                        "note": {"type": "string", "description": "One sentence on why the play matters."},
+                    },
+                    "required": ["play_number", "play_type", "result"],
+                },
+            },
+            "formations": {
+                "type": "array",
+                "description": "Every formation used in this chunk, with usage counts.",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "team": {"type": "string"},
+                        "side": {"type": "string", "enum": ["offense", "defense"]},
+                        "formation": {"type": "string"},
+                        "plays": {"type": "integer"},
+                        "total_gain": {"type": "integer"},
+                    },
+                    "required": ["team", "side", "formation", "plays"],
+                },
+            },
+            "situations": {
+                "type": "array",
+                "description": "Situational counts such as '3rd & short', '3rd & long', '4th down', 'red zone', 'two-minute'.",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "team": {"type": "string"},
+                        "situation": {"type": "string"},
+                        "attempts": {"type": "integer"},
+                        "successes": {"type": "integer"},
+                    },
+                    "required": ["team", "situation", "attempts"],
+                },
+            },
+            "tendencies": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "team": {"type": "string"},
+                        "phase": {"type": "string", "enum": ["offense", "defense", "special teams"]},
+                        "description": {"type": "string"},
+                        "evidence": {"type": "array", "items": {"type": "integer"}, "description": "Play numbers that show it."},
+                    },
+                    "required": ["team", "description"],
+                },
+            },
+        },
+        "required": ["plays", "formations", "situations", "tendencies"],
+    },
+}
+
+# --- Merging ---
+def _norm(value):
+    return " ".join(str(value or "").lower().split())
+
+def merge_extractions(extractions):
+    """
+    Merges per-chunk extraction records into one dataset. Plays are deduplicated by
+    play number (later chunks only fill in missing fields), formation and situation
+    counts are summed per team, and identical tendencies are collapsed with their
+    evidence combined.
+    """
+    teams = {}
+    plays = {}
+    unnumbered = []
+    formations = {}
+    situations = {}
+    tendencies = {}
+
+    for extraction in extractions:
+        for team in extraction.get("teams", []):
+            teams.setdefault(_norm(team), team)
+
+        for play in extraction.get("plays", []):
+            number = play.get("play_number")
+            if not isinstance(number, int):
+                unnumbered.append(play)
+                continue
+            merged = plays.setdefault(number, {})
+            for key, value in play.items():
+                if merged.get(key) in (None, "", []):
+                    merged[key] = value
+
+        for row in extraction.get("formations", []):
+            key = (_norm(row.get("team")), row.get("side"), _norm(row.get("formation")))
+            merged = formations.setdefault(key, {**row, "plays": 0, "total_gain": 0})
+            merged["plays"] += row.get("plays") or 0
+            merged["total_gain"] += row.get("total_gain") or 0
+
+        for row in extraction.get("situations", []):
+            key = (_norm(row.get("team")), _norm(row.get("situation")))
+            merged = situations.setdefault(key, {**row, "attempts": 0, "successes": 0})
+            merged["attempts"] += row.get("attempts") or 0
+            merged["successes"] += row.get("successes") or 0
+
+        for row in extraction.get("tendencies", []):
+            key = (_norm(row.get("team")), row.get("phase"), _norm(row.get("description")))
+            merged = tendencies.setdefault(key, {**row, "evidence": []})
+            for number in row.get("evidence", []):
+                if number not in merged["evidence"]:
+                    merged["evidence"].append(number)
+
+    return {
+        "chunks": len(extractions),
+        "teams": list(teams.values()),
+        "plays": [plays[n] for n in sorted(plays)] + unnumbered,
+        "formations": sorted(formations.values(), key=lambda r: -r["plays"]),
+        "situations": list(situations.values()),
+        "tendencies": list(tendencies.values()),
+    }
+
+def render_dataset(merged):
+    """Compact JSON rendering of a merged dataset for the synthesis prompt."""
+    return json.dumps(merged, ensure_ascii=False, separators=(",", ":"))
+
+# --- Caching ---
+# Part of every cache key, so a change to the tool schema retires extractions made under the old one
+SCHEMA_HASH = hashlib.sha256(json.dumps(EXTRACTION_TOOL, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+def cache_key(*parts):
+    """Stable key for a map call from its model, prompt and chunk text, and the tool schema."""
+    digest = hashlib.sha256(SCHEMA_HASH.encode("utf-8") + b"\0")
+    for part in parts:
+        digest.update(str(part).encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+def load_cached(key):
+    """Returns a previously stored extraction, or None."""
+    try:
+        with open(os.path.join(CACHE_DIR, f"{key}.json"), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+def save_cached(key, extraction):
+    """
+    Stores an extraction as pretty-printed JSON so runs can be diffed. One flagged
+    TRUNCATED was cut off at the output limit and is never stored.
+    """
+    if extraction.get(TRUNCATED):
+        return
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = os.path.join(CACHE_DIR, f"{key}.json")
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(extraction, f, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
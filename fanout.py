@@ -0,0 +1,52 @@
+import concurrent.futures
+import contextvars
+import queue
+
+import tracing
+
+# --- Concurrent Jobs ---
+def fan_out(jobs, on_text=None, poll_seconds=0.1):
+    """
+    Runs named jobs concurrently, one thread each, and returns {name: result}.
+
+    Every job is called with an `emit(text)` callback for streamed output; `emit(None)`
+    means the job restarted (a retried call) and its text so far should be discarded.
+    Each job runs in its own copy of the caller's context, so its trace spans nest
+    under the current report. `on_text(name, text_so_far)` is only ever called from the
+    calling thread, which keeps Streamlit element updates on the script thread. A job
+    that raises gets a None result and an error on its span.
+    """
+    updates = queue.Queue()
+
+    def run(name, job):
+        with tracing.span("fanout_job", job=name) as attrs:
+            try:
+                return job(lambda text: updates.put((name, text)))
+            except Exception as e:
+                tracing.mark_error(attrs, str(e))
+                return None
+
+    buffers = {name: "" for name in jobs}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(len(jobs), 1)) as executor:
+        futures = {
+            name: executor.submit(contextvars.copy_context().run, run, name, job)
+            for name, job in jobs.items()
+        }
+        pending = set(futures.values())
+        while pending or not updates.empty():
+            try:
+                batch = [updates.get(timeout=poll_seconds)]
+            except queue.Empty:
+                pending = {future for future in pending if not future.done()}
+                continue
+            # Coalesce whatever else arrived so each job redraws at most once per pass
+            while not updates.empty():
+                batch.append(updates.get_nowait())
+            changed = []
+            for name, text in batch:
+                buffers[name] = "" if text is None else buffers[name] + text
+                changed.append(name)
+            if on_text:
+                for name in dict.fromkeys(changed):
+                    on_text(name, buffers[name])
+        return {name: future.result() for name, future in futures.items()}
@@ -0,0 +1,61 @@
+import json
+
+# --- Game Structure Helpers ---
+def iter_plays(game_data):
+    """
+    Yields every play record in a game, in file order. A play is any dict that carries
+    a `breakdownData` block, wherever it sits in the game export.
+    """
+    stack = [game_data]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            if isinstance(node.get("breakdownData"), dict):
+                yield node
+                continue
+            stack.extend(reversed(list(node.values())))
+        elif isinstance(node, list):
+            stack.extend(reversed(node))
+
+def count_plays(game_data):
+    """Returns the number of play records in a game."""
+    return sum(1 for _ in iter_plays(game_data))
+
+def breakdown_value(play, name):
+    """Looks up a breakdownData column by name, ignoring case. Returns None when absent."""
+    name = name.upper()
+    for key, value in play["breakdownData"].items():
+        if key.upper() == name:
+            return value
+    return None
+
+def group_by_series(plays):
+    """
+    Groups consecutive plays into drives by SERIES #, falling back to a change of the
+    offensive TEAM when the column is missing. Returns (key, plays) pairs in game order;
+    keys stay stable as more plays are appended.
+    """
+    drives = []
+    last_marker = object()
+    for play in plays:
+        series = breakdown_value(play, "SERIES #")
+        marker = series if series not in (None, "") else breakdown_value(play, "TEAM")
+        if not drives or marker != last_marker:
+            drives.append((f"{len(drives) + 1}:{marker}", []))
+            last_marker = marker
+        drives[-1][1].append(play)
+    return drives
+
+def parse_games(content):
+    """
+    Parses the game archive format: either a JSON array or comma-separated game objects
+    with an optional trailing comma. Raises json.JSONDecodeError on malformed input.
+    """
+    content = content.strip()
+    if not content:
+        return []
+    if not content.startswith('['):
+        if content.endswith(','):
+            content = content[:-1]
+        content = f"[{content}]"
+    return json.loads(content)
@@ -0,0 +1,302 @@
+import collections
+import contextvars
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+import tracing
+
+# --- Configuration ---
+# Seconds one call of a stage may take in total, retries and hedges included
+STAGE_TIMEOUT_SECONDS = {
+    "map": float(os.environ.get("FOOTBALL_MAP_TIMEOUT", 60)),
+    "draft": float(os.environ.get("FOOTBALL_REDUCE_TIMEOUT", 180)),
+    "reduce": float(os.environ.get("FOOTBALL_REDUCE_TIMEOUT", 180)),
+    "single": float(os.environ.get("FOOTBALL_REDUCE_TIMEOUT", 180)),
+}
+DEFAULT_STAGE_TIMEOUT = 180.0
+# Wall-clock budget for one whole report; map calls stop early enough to leave the reserve for synthesis
+REPORT_DEADLINE_SECONDS = float(os.environ.get("FOOTBALL_REPORT_DEADLINE", 300))
+SYNTHESIS_RESERVE_SECONDS = float(os.environ.get("FOOTBALL_SYNTHESIS_RESERVE", 90))
+MAP_STAGES = ("map",)
+
+HEDGING_ENABLED = os.environ.get("FOOTBALL_HEDGE", "1") != "0"
+HEDGE_QUANTILE = 0.95
+# Latencies kept per stage and model, and how many are needed before hedging starts
+LATENCY_WINDOW = 200
+MIN_SAMPLES = 20
+MIN_HEDGE_SECONDS = 1.0
+# Hedges sent stay under this share of recent calls, so a slow API is not hit twice as hard
+MAX_HEDGE_SHARE = 0.15
+# How long a timed-out streaming call gets to hand back the text it already has
+TIMEOUT_GRACE_SECONDS = 2.0
+
+_report_deadline = contextvars.ContextVar("report_deadline", default=None)
+
+class StageTimeout(TimeoutError):
+    """A call ran past its stage timeout or the report deadline."""
+
+# --- Latency Tracking ---
+class LatencyTracker:
+    """
+    Recent call latencies per (stage, model): time to first token for streamed text,
+    time to the full answer for tool calls. The first lookup seeds the window from
+    the `progress_ms` of the most recent spans in the trace file, so hedging works
+    from the first report after a restart.
+    """
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self._samples = collections.defaultdict(lambda: collections.deque(maxlen=window))
+        self._hedged = collections.defaultdict(lambda: collections.deque(maxlen=window))
+        self._lock = threading.Lock()
+        self._seeded = False
+
+    def _seed(self):
+        if self._seeded:
+            return
+        self._seeded = True
+        for record in tracing.load_spans(tail_bytes=tracing.SEED_TAIL_BYTES):
+            attrs = record.get("attributes", {})
+            if "progress_ms" in attrs and record.get("status", {}).get("code") == "OK":
+                self._samples[(record["name"], attrs.get("model"))].append(attrs["progress_ms"] / 1000)
+
+    def record(self, stage, model, seconds, hedged=False):
+        with self._lock:
+            self._seed()
+            self._samples[(stage, model)].append(seconds)
+            self._hedged[(stage, model)].append(hedged)
+
+    def quantile(self, stage, model, q):
+        """The q-quantile of recent latencies, or None with fewer than MIN_SAMPLES."""
+        with self._lock:
+            self._seed()
+            samples = sorted(self._samples[(stage, model)])
+        if len(samples) < MIN_SAMPLES:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    def hedge_delay(self, stage, model):
+        """Seconds to wait before sending a duplicate, or None when hedging is off for now."""
+        if not HEDGING_ENABLED:
+            return None
+        with self._lock:
+            recent = self._hedged[(stage, model)]
+            if recent and sum(recent) >= MAX_HEDGE_SHARE * len(recent):
+                return None
+        delay = self.quantile(stage, model, HEDGE_QUANTILE)
+        return None if delay is None else max(MIN_HEDGE_SECONDS, delay)
+
+tracker = LatencyTracker()
+
+# --- Deadlines ---
+@contextmanager
+def report_deadline(seconds=REPORT_DEADLINE_SECONDS):
+    """Sets the wall-clock budget for the report built inside the block, threads included."""
+    token = _report_deadline.set(time.perf_counter() + seconds)
+    try:
+        yield
+    finally:
+        _report_deadline.reset(token)
+
+def call_deadline(stage):
+    """
+    Absolute perf_counter time by which a call of `stage` must finish: its stage
+    timeout, cut short by the report deadline. Map stages also leave the synthesis
+    reserve, so a slow map tail can never eat the time the report needs.
+    """
+    now = time.perf_counter()
+    deadline = now + STAGE_TIMEOUT_SECONDS.get(stage, DEFAULT_STAGE_TIMEOUT)
+    report_end = _report_deadline.get()
+    if report_end is not None:
+        if stage in MAP_STAGES:
+            report_end -= SYNTHESIS_RESERVE_SECONDS
+        deadline = min(deadline, report_end)
+    return deadline
+
+def missing_note(missing_parts, total_parts):
+    """Prompt text for a synthesis that runs without some chunks."""
+    if not missing_parts:
+        return ""
+    parts = ", ".join(str(p) for p in missing_parts)
+    return (
+        f"Parts {parts} of {total_parts} did not come back in time, so the dataset has gaps there. "
+        "Say briefly where the report is missing coverage instead of guessing what happened."
+    )
+
+# --- Hedged Calls ---
+class Lane:
+    """
+    One attempt in a race. The attempt reports `opened(stream)` once it has a stream,
+    `token(text)` for every delta, and checks `cancelled` between events.
+    """
+
+    def __init__(self, race, name):
+        self.name = name
+        self.cancelled = threading.Event()
+        self._race = race
+        self._stream = None
+        self._usage_recorded = False
+        self.first_token_at = None
+
+    def opened(self, stream):
+        self._stream = stream
+        if self.cancelled.is_set():
+            self._close()
+
+    def token(self, text=None):
+        self._race.progress(self, text)
+
+    def cancel(self):
+        self.cancelled.set()
+        self._close()
+        self._record_usage()
+
+    def _record_usage(self):
+        """A cancelled lane's tokens are billed too; they go on a span of their own."""
+        if self._stream is None or self._usage_recorded:
+            return
+        self._usage_recorded = True
+        try:
+            usage = self._stream.current_message_snapshot.usage
+        except Exception:
+            return  # Cancelled before the response started
+        with tracing.span("hedge_cancelled", stage=self._race.stage, lane=self.name) as attrs:
+            tracing.record_usage(attrs, self._race.model, usage)
+
+    def _close(self):
+        try:
+            if self._stream is not None:
+                self._stream.close()
+        except Exception:
+            pass
+
+class _Race:
+    def __init__(self, stage, model, streaming, on_text):
+        self.stage = stage
+        self.model = model
+        self.streaming = streaming
+        self.on_text = on_text
+        self.lanes = []
+        self.winner = None
+        self.events = queue.Queue()
+        self._lock = threading.Lock()
+
+    def launch(self, attempt, name):
+        lane = Lane(self, name)
+        self.lanes.append(lane)
+        context = contextvars.copy_context()
+
+        def run():
+            try:
+                self.events.put((lane, "done", context.run(attempt, lane)))
+            except Exception as e:
+                self.events.put((lane, "error", e))
+
+        # Daemon threads: a stalled loser must never hold the process open
+        threading.Thread(target=run, name=f"hedge-{name}", daemon=True).start()
+        return lane
+
+    def progress(self, lane, text):
+        with self._lock:
+            if lane.first_token_at is None:
+                lane.first_token_at = time.perf_counter()
+            if self.streaming and self.winner is None:
+                # The first lane to produce text wins a streamed race
+                self.winner = lane
+                self.events.put((lane, "won", None))
+            if text is not None and self.on_text and self.winner is lane:
+                self.on_text(text)
+
+    def decide(self, lane):
+        with self._lock:
+            if self.winner is None:
+                self.winner = lane
+        for other in self.lanes:
+            if other is not self.winner:
+                other.cancel()
+
+def race(attempt, stage, model=None, deadline=None, streaming=True, on_text=None, attrs=None):
+    """
+    Runs `attempt(lane)` and returns its result. If no progress has arrived by the
+    observed p95 latency for this stage and model (first token when `streaming`, the
+    whole answer otherwise), a duplicate attempt is started; the first lane to make
+    progress wins and the other is cancelled, its usage so far recorded on a
+    hedge_cancelled span. Only the winner's text reaches `on_text`. Past `deadline`
+    the race raises StageTimeout, except that a streamed winner is stopped and its
+    partial result returned. An error is raised only once every lane has failed.
+    """
+    attrs = attrs if attrs is not None else {}
+    start = time.perf_counter()
+    deadline = deadline if deadline is not None else call_deadline(stage)
+    if deadline <= start:
+        raise StageTimeout(f"{stage} call skipped: no time left before the deadline")
+
+    state = _Race(stage, model, streaming, on_text)
+    state.launch(attempt, "primary")
+    hedge_delay = tracker.hedge_delay(stage, model)
+    hedge_at = start + hedge_delay if hedge_delay is not None and start + hedge_delay < deadline else None
+    failures = []
+    while True:
+        now = time.perf_counter()
+        wake = min(deadline, hedge_at) if hedge_at else deadline
+        try:
+            lane, kind, payload = state.events.get(timeout=max(0.0, wake - now))
+        except queue.Empty:
+            if hedge_at and time.perf_counter() >= hedge_at:
+                hedge_at = None
+                state.launch(attempt, "hedge")
+                attrs["hedged"] = True
+                attrs["hedge_after_ms"] = round(hedge_delay * 1000, 2)
+                continue
+            if time.perf_counter() >= deadline:
+                return _expire(state, stage, model, start, attrs)
+            continue
+
+        if kind == "won":
+            state.decide(lane)
+            continue
+        if kind == "error":
+            failures.append(payload)
+            if lane is state.winner or len(failures) == len(state.lanes):
+                for other in state.lanes:
+                    other.cancel()
+                raise payload
+            continue
+        # A finished lane wins unless another lane already started streaming
+        if state.winner not in (None, lane):
+            continue
+        state.decide(lane)
+        _settle(state, lane, stage, model, start, attrs)
+        return payload
+
+def _settle(state, lane, stage, model, start, attrs):
+    progress_at = lane.first_token_at if state.streaming and lane.first_token_at else time.perf_counter()
+    seconds = progress_at - start
+    tracker.record(stage, model, seconds, hedged=len(state.lanes) > 1)
+    attrs["progress_ms"] = round(seconds * 1000, 2)
+    attrs["hedge_winner"] = lane.name
+    if lane.first_token_at:
+        attrs["ttft_ms"] = round((lane.first_token_at - start) * 1000, 2)
+
+def _expire(state, stage, model, start, attrs):
+    """Deadline reached: hand back a streaming winner's partial answer, or give up."""
+    winner = state.winner
+    attrs["timed_out"] = True
+    if winner is not None and state.streaming:
+        winner.cancelled.set()  # The attempt stops at its next event and returns what it has
+        grace_end = time.perf_counter() + TIMEOUT_GRACE_SECONDS
+        while time.perf_counter() < grace_end:
+            try:
+                lane, kind, payload = state.events.get(timeout=max(0.0, grace_end - time.perf_counter()))
+            except queue.Empty:
+                break
+            if lane is winner and kind == "done":
+                _settle(state, lane, stage, model, start, attrs)
+                return payload
+    for lane in state.lanes:
+        lane.cancel()
+    # A timeout is the latency this call would have needed at least; it raises the tail estimate
+    tracker.record(stage, model, time.perf_counter() - start, hedged=len(state.lanes) > 1)
+    raise StageTimeout(f"{stage} call timed out after {time.perf_counter() - start:.1f}s")
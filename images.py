@@ -0,0 +1,148 @@
+import base64
+import concurrent.futures
+import io
+import os
+
+import tracing
+
+# --- Configuration ---
+# Images larger than this on the long edge, or in total pixels, are downscaled by the
+# API anyway; sending them bigger only costs upload time.
+MAX_LONG_EDGE = 1568
+MAX_PIXELS = 1_150_000
+PIXELS_PER_TOKEN = 750
+JPEG_QUALITY = 85
+# Image tokens one report request may spend; lowest-value images are dropped first
+IMAGE_TOKEN_BUDGET = int(os.environ.get("FOOTBALL_IMAGE_TOKEN_BUDGET", 6000))
+# Perceptual hashes this many bits apart or closer are treated as the same picture
+DUPLICATE_DISTANCE = 6
+MAX_WORKERS = min(4, os.cpu_count() or 1)
+
+# --- Preparation ---
+def estimate_tokens(width, height):
+    """Approximate input tokens the model charges for an image of this size."""
+    return max(1, round(width * height / PIXELS_PER_TOKEN))
+
+def _fit(width, height):
+    scale = min(1.0, MAX_LONG_EDGE / max(width, height), (MAX_PIXELS / (width * height)) ** 0.5)
+    return max(1, int(width * scale)), max(1, int(height * scale))
+
+def difference_hash(image):
+    """64-bit dHash: each bit says whether a pixel is brighter than its right neighbour."""
+    from PIL import Image
+
+    small = image.convert("L").resize((9, 8), Image.Resampling.LANCZOS)
+    pixels = list(small.getdata())
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            bits = (bits << 1) | (pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+    return bits
+
+def prepare_image(data, name):
+    """
+    Downscales an image to the size the model uses and recompresses it, keeping
+    whichever of JPEG or PNG is smaller. Returns the base64 payload with its size,
+    token estimate, perceptual hash and an information score used to rank images.
+    """
+    from PIL import Image
+
+    with Image.open(io.BytesIO(data)) as image:
+        image.load()
+        source_format = image.format
+        width, height = _fit(*image.size)
+        if (width, height) != image.size:
+            image = image.resize((width, height), Image.Resampling.LANCZOS)
+        has_alpha = image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+        rgb = image.convert("RGBA" if has_alpha else "RGB")
+
+        # Screenshots often stay smaller as PNG; photos never do, so only PNGs try both
+        candidates = []
+        if has_alpha or source_format == "PNG":
+            png = io.BytesIO()
+            rgb.save(png, format="PNG")
+            candidates.append(("image/png", png.getvalue()))
+        if not has_alpha:
+            jpeg = io.BytesIO()
+            rgb.save(jpeg, format="JPEG", quality=JPEG_QUALITY, optimize=True)
+            candidates.append(("image/jpeg", jpeg.getvalue()))
+        media_type, encoded = min(candidates, key=lambda c: len(c[1]))
+
+        return {
+            "name": name,
+            "media_type": media_type,
+            "data": base64.standard_b64encode(encoded).decode("ascii"),
+            "width": width,
+            "height": height,
+            "tokens": estimate_tokens(width, height),
+            "phash": difference_hash(rgb),
+            # Histogram entropy: near-blank or flat screenshots score low
+            "score": round(rgb.convert("L").entropy(), 3),
+            "bytes": len(encoded),
+            "original_bytes": len(data),
+        }
+
+def prepare_images(files, cached=None):
+    """
+    Prepares uploaded images on a thread pool. `files` is a list of (key, name, bytes
+    loader) tuples; keys found in `cached` are reused without decoding again. Returns
+    ({key: payload}, {name: error}) in upload order.
+    """
+    cached = cached or {}
+    payloads, errors = {}, {}
+    with tracing.span("prepare_images", images=len(files)) as attrs:
+        todo = [(key, name, load) for key, name, load in files if cached.get(key) is None]
+        with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            futures = {key: (name, executor.submit(prepare_image, load(), name)) for key, name, load in todo}
+        for key, name, _ in files:
+            if key not in futures:
+                payloads[key] = cached[key]
+                continue
+            name, future = futures[key]
+            try:
+                payloads[key] = future.result()
+            except Exception as e:
+                errors[name] = str(e)
+        attrs["prepared"] = len(todo)
+        attrs["cached"] = len(files) - len(todo)
+        attrs["errors"] = len(errors)
+        attrs["original_bytes"] = sum(p["original_bytes"] for p in payloads.values())
+        attrs["bytes"] = sum(p["bytes"] for p in payloads.values())
+        return payloads, errors
+
+# --- Selection ---
+def select_images(payloads, token_budget=IMAGE_TOKEN_BUDGET):
+    """
+    Picks the images to send. Near-duplicates (by perceptual hash) keep only their
+    highest-scoring copy; the rest are added best score first while they fit in the
+    token budget. Returns (selected in upload order, [(payload, reason)] dropped).
+    """
+    with tracing.span("select_images", images=len(payloads), token_budget=token_budget) as attrs:
+        ranked = sorted(payloads, key=lambda p: -p["score"])
+        unique, dropped = [], []
+        for payload in ranked:
+            if any(bin(payload["phash"] ^ other["phash"]).count("1") <= DUPLICATE_DISTANCE for other in unique):
+                dropped.append((payload, "duplicate"))
+            else:
+                unique.append(payload)
+
+        kept, tokens = [], 0
+        for payload in unique:
+            if tokens + payload["tokens"] > token_budget:
+                dropped.append((payload, "over token budget"))
+            else:
+                kept.append(payload)
+                tokens += payload["tokens"]
+        selected = [p for p in payloads if any(p is k for k in kept)]
+        attrs["selected"] = len(selected)
+        attrs["duplicates"] = sum(1 for _, reason in dropped if reason == "duplicate")
+        attrs["over_budget"] = sum(1 for _, reason in dropped if reason != "duplicate")
+        attrs["image_tokens"] = tokens
+        return selected, dropped
+
+def image_blocks(selected):
+    """Anthropic message content blocks for the selected images."""
+    return [
+        {"type": "image", "source": {"type": "base64", "media_type": p["media_type"], "data": p["data"]}}
+        for p in selected
+    ]
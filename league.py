@@ -0,0 +1,85 @@
+import streamlit as st
+
+import archive
+import pipeline
+import templates
+import tracing
+
+MODEL_NAME = "claude-sonnet-4-20250514"
+NARRATE_TEMPLATE = "league/narrate.v1.md"
+ARCHIVE_FILE = "footballdict.json"
+
+# --- Page Configuration ---
+st.set_page_config(
+    page_title="League Analytics",
+    page_icon="🏈",
+    layout="wide"
+)
+
+# --- Archive ---
+def load_aggregates(file_path):
+    """Refreshes the precomputed aggregates; only games appended since the last run are processed."""
+    try:
+        return archive.refresh(file_path)
+    except FileNotFoundError:
+        st.error(f"Error: The file '{file_path}' was not found.")
+        return None, None
+    except Exception as e:
+        st.error(f"Error building the archive aggregates: {e}")
+        return None, None
+
+# --- Narration ---
+def narrate_stream(query_name, filters, result):
+    """Streams a written briefing of a query result. Only the result table is sent."""
+    client = pipeline.create_client()
+    if client is None:
+        return
+    prompt_text = templates.render(
+        NARRATE_TEMPLATE,
+        query=query_name,
+        filters=filters,
+        result_table=result.to_markdown(index=False, floatfmt=".3f"),
+    )
+    yield from pipeline.stream_text(
+        client, prompt_text, "narrate_stream", MODEL_NAME, 1500, "An error occurred while narrating the results",
+        prompt_chars=len(prompt_text), rows=len(result)
+    )
+
+# --- Main Application UI ---
+st.title("🏈 League Analytics")
+st.markdown("League-wide questions answered from every game in the archive.")
+
+aggregates, manifest = load_aggregates(ARCHIVE_FILE)
+
+if aggregates is not None:
+    situations = aggregates["situations"]
+    seasons = sorted(situations["season"].dropna().unique().tolist())
+    teams = sorted(situations["team"].dropna().unique().tolist())
+
+    with st.sidebar:
+        st.header("🔎 Query")
+        query_name = st.selectbox("Question:", list(archive.QUERIES))
+        season = st.selectbox("Season:", ["All seasons", *seasons])
+        team = st.selectbox("Team:", ["All teams", *teams])
+        min_attempts = st.number_input("Minimum attempts:", min_value=1, value=3)
+        st.caption(f"{len(manifest['game_ids'])} games in the archive")
+
+    season = None if season == "All seasons" else season
+    team = None if team == "All teams" else team
+    result = archive.run_query(query_name, aggregates, season=season, team=team, min_attempts=min_attempts)
+
+    st.subheader(query_name)
+    if result.empty:
+        st.info("No rows match these filters.")
+    else:
+        st.dataframe(result, use_container_width=True, hide_index=True)
+        rate_column = "success_rate" if "success_rate" in result.columns else "rate"
+        label_column = "off_formation" if "off_formation" in result.columns else "team"
+        st.bar_chart(result.groupby(label_column)[rate_column].max())
+
+        if st.button("📝 Narrate These Results", type="primary"):
+            filters = f"season={season or 'all'}, team={team or 'all'}, min_attempts={min_attempts}"
+            with tracing.start_trace("league", mode=query_name) as report_attrs:
+                report_attrs["rows"] = len(result)
+                with st.container(border=True):
+                    st.write_stream(narrate_stream(query_name, filters, result))
@@ -0,0 +1,168 @@
+import csv
+import hashlib
+import io
+import json
+import os
+
+import gamedata
+import tracing
+
+# --- Configuration ---
+LIVE_DIR = os.environ.get("FOOTBALL_LIVE_STATE", os.path.join(".cache", "live"))
+# The end of the story sent with each update so new drives continue it; earlier parts are left out
+STORY_CONTEXT_CHARS = 4000
+# An update holds the new drives' narrative, then this line, then the revised closing themes
+THEMES_MARKER = "<!-- themes -->"
+# Malformed feed lines kept in the state for inspection; older ones are dropped
+MAX_SKIPPED_LINES = 50
+
+# --- State ---
+def _state_path(feed_path):
+    digest = hashlib.sha1(os.path.abspath(feed_path).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(LIVE_DIR, f"{digest}.json")
+
+def new_state(feed_path):
+    return {
+        "feed_path": feed_path,
+        "offset": 0,          # bytes of the feed already consumed (line-based feeds)
+        "csv_header": None,
+        "plays": [],
+        "drive_records": {},  # drive key -> {"plays": count when analyzed, "record": extraction}
+        "narrated": {},       # drive key -> play count when folded into the narrative
+        "clip_urls": [],
+        "story": "",          # drive-by-drive narrative; updates only append to it
+        "themes": "",         # closing momentum and tactical-themes sections, rewritten by each update
+        "narrative": "",      # story and themes as shown
+        "lines_skipped": 0,   # malformed feed lines passed over so far
+        "skipped_lines": [],  # the latest of them, newest last
+        "final": False,
+    }
+
+def load_state(feed_path):
+    """Loads the rolling state for a feed, or starts a fresh one."""
+    try:
+        with open(_state_path(feed_path), 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        # States saved before the story and themes were kept apart
+        state.setdefault("story", state.get("narrative", ""))
+        state.setdefault("themes", "")
+        state.setdefault("lines_skipped", 0)
+        state.setdefault("skipped_lines", [])
+        return state
+    except (FileNotFoundError, json.JSONDecodeError):
+        return new_state(feed_path)
+
+def save_state(state):
+    os.makedirs(LIVE_DIR, exist_ok=True)
+    path = _state_path(state["feed_path"])
+    with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False)
+    os.replace(f"{path}.tmp", path)
+
+def reset_state(feed_path):
+    try:
+        os.remove(_state_path(feed_path))
+    except FileNotFoundError:
+        pass
+
+# --- Feed Tailing ---
+def _read_appended_lines(feed_path, state):
+    """Returns complete lines appended since the last read and advances the offset."""
+    with open(feed_path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        if f.tell() < state["offset"]:
+            raise ValueError("The feed file shrank; reset the live state to start over.")
+        f.seek(state["offset"])
+        data = f.read()
+    # Leave a trailing partial line for the next poll
+    end = data.rfind(b"\n") + 1
+    state["offset"] += end
+    return data[:end].decode("utf-8", errors="replace").splitlines()
+
+def read_new_plays(feed_path, state):
+    """
+    Reads plays appended to a feed since the last call. JSON-lines and CSV feeds are
+    tailed from the stored byte offset; a plain .json file is re-parsed and only plays
+    past the known count are returned. CSV rows become `breakdownData` records.
+    Malformed JSON lines are skipped and kept in the state's `skipped_lines`.
+    """
+    with tracing.span("read_new_plays", feed_path=feed_path) as attrs:
+        if feed_path.endswith(".json"):
+            with open(feed_path, 'r', encoding='utf-8') as f:
+                content = f.read().strip().rstrip(',')
+            if not content:
+                new_plays = []
+            else:
+                parsed = json.loads(content if content.startswith('[') else f"[{content}]")
+                new_plays = list(gamedata.iter_plays(parsed))[len(state["plays"]):]
+        elif feed_path.endswith(".csv"):
+            lines = _read_appended_lines(feed_path, state)
+            if lines and state["csv_header"] is None:
+                state["csv_header"] = next(csv.reader([lines.pop(0)]))
+            rows = csv.DictReader(io.StringIO("\n".join(lines)), fieldnames=state["csv_header"])
+            new_plays = [{"breakdownData": dict(row)} for row in rows]
+        else:
+            new_plays = []
+            skipped = 0
+            for line in _read_appended_lines(feed_path, state):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                    if not isinstance(record, dict):
+                        raise ValueError("not a JSON object")
+                except ValueError as e:
+                    # The offset is already past this line; a bad line must not stall the feed
+                    state["skipped_lines"] = (state["skipped_lines"] + [{"line": line[:200], "error": str(e)}])[-MAX_SKIPPED_LINES:]
+                    state["lines_skipped"] += 1
+                    skipped += 1
+                    continue
+                new_plays.append(record if "breakdownData" in record else {"breakdownData": record})
+            attrs["skipped_lines"] = skipped
+
+        state["plays"].extend(new_plays)
+        attrs["new_plays"] = len(new_plays)
+        attrs["total_plays"] = len(state["plays"])
+        return new_plays
+
+# --- Drives ---
+def drives_to_analyze(state, drives):
+    """
+    Drives whose records are missing or stale. The last drive is still in progress
+    until a later series starts, so it is held back unless the game is marked final.
+    """
+    closed = drives if state["final"] else drives[:-1]
+    return [
+        (key, plays) for key, plays in closed
+        if state["drive_records"].get(key, {}).get("plays") != len(plays)
+    ]
+
+def drives_to_narrate(state, drives):
+    """Analyzed drives that have not been folded into the narrative at their current size."""
+    return [
+        (key, plays) for key, plays in drives
+        if key in state["drive_records"]
+        and state["narrated"].get(key) != state["drive_records"][key]["plays"]
+    ]
+
+# --- Narrative ---
+def story_context(state):
+    """The end of the story so far, starting at a paragraph break."""
+    story = state["story"]
+    if len(story) <= STORY_CONTEXT_CHARS:
+        return story
+    tail = story[-STORY_CONTEXT_CHARS:]
+    return "(earlier drives omitted)\n\n" + tail[tail.find("\n\n") + 2:] if "\n\n" in tail else tail
+
+def apply_update(state, update):
+    """
+    Appends an update's new-drive narrative to the story and replaces the themes with
+    its revised ones. An update without THEMES_MARKER keeps the current themes.
+    """
+    new_story, _, themes = update.partition(THEMES_MARKER)
+    if new_story.strip():
+        state["story"] = "\n\n".join(part for part in (state["story"].rstrip(), new_story.strip()) if part)
+    if themes.strip():
+        state["themes"] = themes.strip()
+    state["narrative"] = "\n\n".join(part for part in (state["story"], state["themes"]) if part)
+    return state
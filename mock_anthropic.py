@@ -0,0 +1,158 @@
+import random
+import threading
+from types import SimpleNamespace
+
+# --- Latency Distributions ---
+def constant(seconds):
+    return lambda rng: seconds
+
+def lognormal(median, sigma):
+    """Right-skewed call latency: most calls near `median`, a long tail above it."""
+    import math
+    return lambda rng: rng.lognormvariate(math.log(median), sigma)
+
+def with_stalls(base, probability, stall_seconds):
+    """Wraps a distribution so a share of calls stall for `stall_seconds` on top of it."""
+    return lambda rng: base(rng) + (stall_seconds if rng.random() < probability else 0.0)
+
+# --- Mock Client ---
+class MockStream:
+    """Imitates the SDK's MessageStream: iterate for events, then read the final message."""
+
+    def __init__(self, client, request):
+        self._client = client
+        self._request = request
+        self._text = []
+        self._done = False
+        self._output_tokens = None
+        self._stop_reason = "end_turn"
+        self._closed = threading.Event()
+        self._events = self._generate()
+        self._input_tokens = sum(len(str(m["content"])) for m in request["messages"]) // 4
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if not self._done:
+            self._client._record("cancelled", self._request)
+        return False
+
+    def __iter__(self):
+        return self._events
+
+    def close(self):
+        # Like the SDK, closing interrupts a call that is still waiting on the server
+        self._closed.set()
+
+    def _generate(self):
+        client, request = self._client, self._request
+        max_tokens = request.get("max_tokens", 4096)
+        if request.get("tools"):
+            rng = client.draw_rng()
+            wait = client.latency(rng, "map")
+            if client.map_output_ratio:
+                # Records grow with the chunk; the call also takes the time to write them
+                wanted = int(client.map_output_ratio * self._input_tokens * rng.lognormvariate(0, client.map_output_sigma))
+                self._output_tokens = min(wanted, max_tokens)
+                if wanted > max_tokens:
+                    self._stop_reason = "max_tokens"
+                wait += self._output_tokens / client.tokens_per_second
+            if self._closed.wait(wait):
+                return
+            self._done = True
+            yield SimpleNamespace(type="content_block_delta", delta=SimpleNamespace(type="input_json_delta", partial_json="{}"))
+            return
+        rng = client.draw_rng()
+        if self._closed.wait(client.latency(rng, "text")):
+            return
+        remaining = client.output_tokens
+        if client.output_sigma:
+            remaining = round(remaining * rng.lognormvariate(0, client.output_sigma))
+        if request["messages"][-1]["role"] == "assistant":
+            # A prefilled answer is continued, not restarted
+            remaining -= len(request["messages"][-1]["content"].split())
+        if request.get("stop_sequences"):
+            self._stop_reason = "stop_sequence"
+        else:
+            # Without the end marker as a stop sequence the model keeps going after the report
+            remaining += client.chatter_tokens
+        budget = max(0, min(max_tokens, remaining))
+        if remaining > max_tokens:
+            self._stop_reason = "max_tokens"
+        for i in range(budget):
+            if i and i % client.tokens_per_tick == 0:
+                if self._closed.wait(client.tokens_per_tick / client.tokens_per_second):
+                    return
+            # Paragraphs of about 40 tokens, with a section heading every third one
+            word = f"w{i} " if i % 40 != 39 else ("\n\n## Section\n\n" if i % 120 == 119 else "\n\n")
+            self._text.append(word)
+            yield SimpleNamespace(type="content_block_delta", delta=SimpleNamespace(type="text_delta", text=word))
+        self._done = True
+
+    @property
+    def current_message_snapshot(self):
+        return self._message()
+
+    def get_final_message(self):
+        for _ in self._events:
+            pass
+        return self._message()
+
+    def _message(self):
+        usage = SimpleNamespace(
+            input_tokens=self._input_tokens,
+            output_tokens=len(self._text) if self._output_tokens is None else self._output_tokens,
+            cache_creation_input_tokens=0, cache_read_input_tokens=0,
+        )
+        if self._request.get("tools"):
+            content = [SimpleNamespace(type="tool_use", input=self._client.extraction(self._request))]
+        else:
+            content = [SimpleNamespace(type="text", text="".join(self._text))]
+        return SimpleNamespace(usage=usage, stop_reason=self._stop_reason, content=content)
+
+class MockClient:
+    """
+    Stands in for anthropic.Anthropic in benchmarks. `map_latency` and `text_latency`
+    draw the delay before a tool call returns or before the first text token; text
+    then streams `output_tokens` (lognormal spread `output_sigma`) at `tokens_per_second`.
+    Calls and cancellations are counted.
+    With `map_output_ratio` a tool call writes that many output tokens per input token
+    (lognormal spread `map_output_sigma`) and is cut off at its max_tokens. A text call
+    without stop sequences writes `chatter_tokens` more after the report.
+    """
+
+    def __init__(self, map_latency=constant(1.0), text_latency=constant(0.8), tokens_per_second=80.0,
+                 output_tokens=600, seed=0, tokens_per_tick=8, map_output_ratio=None, map_output_sigma=0.25,
+                 output_sigma=0.0, chatter_tokens=0):
+        self.map_latency = map_latency
+        self.text_latency = text_latency
+        self.tokens_per_second = tokens_per_second
+        self.tokens_per_tick = tokens_per_tick
+        self.output_tokens = output_tokens
+        self.map_output_ratio = map_output_ratio
+        self.map_output_sigma = map_output_sigma
+        self.output_sigma = output_sigma
+        self.chatter_tokens = chatter_tokens
+        self.calls = {"map": 0, "text": 0, "cancelled": 0}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.messages = SimpleNamespace(stream=self._stream)
+
+    def draw_rng(self):
+        with self._lock:
+            return random.Random(self._rng.random())
+
+    def latency(self, rng, kind):
+        return (self.map_latency if kind == "map" else self.text_latency)(rng)
+
+    def _record(self, kind, request):
+        with self._lock:
+            self.calls[kind] += 1
+
+    def _stream(self, **request):
+        self._record("map" if request.get("tools") else "text", request)
+        return MockStream(self, request)
+
+    def extraction(self, request):
+        return {"teams": [], "plays": [], "formations": [], "situations": [], "tendencies": []}
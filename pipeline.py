@@ -0,0 +1,512 @@
+import streamlit as st
+import contextvars
+import time
+from contextlib import contextmanager
+
+import budgets
+import clips
+import drives
+import extraction
+import fanout
+import hedging
+import planner
+import projection
+import speculative
+import tracing
+
+# --- Configuration ---
+MAP_MAX_TOKENS = 2048  # Ceiling for map budgets: map calls return compact records, not prose
+MAX_RETRIES = 2
+# Ends a text answer cut off by the deadline, or still at the output limit after its continuation
+TRUNCATED_NOTE = "\n\n*This answer was cut off here before it was finished.*"
+
+# The report apps share the model calls and report steps below; each passes its own
+# analyst persona as `system` and its own wording as `labels`:
+#   map_step        progress text per chunk, with {part} and {total}
+#   streaming       progress text while reports stream early, with {done} and {total}
+#   map_start       progress text before the first chunk
+#   synthesize_all  progress text before several reports, with {count}
+#   subheader       heading of a multi-report run, with {away} and {home}
+#   tab             tab title of one report, with {name}
+#   failed          error shown in a tab whose report failed, with {name}
+#   download        optional label of a download button under each report
+#   single          spinner text while a game small enough for one call is analyzed
+#   synthesize_one  progress text before the one report of a mapped game
+
+# Errors of calls made on worker threads, where Streamlit drops any element drawn
+_deferred_errors = contextvars.ContextVar("deferred_errors", default=None)
+
+# --- Error Reporting ---
+@contextmanager
+def deferred_errors(errors=None):
+    """
+    Collects the error messages of calls made inside the block, including calls on
+    threads started in copies of its context, instead of drawing them. Yields the
+    list; the caller shows it with st.error once it is back on the script thread.
+    """
+    errors = [] if errors is None else errors
+    token = _deferred_errors.set(errors)
+    try:
+        yield errors
+    finally:
+        _deferred_errors.reset(token)
+
+def _report_error(message):
+    errors = _deferred_errors.get()
+    if errors is None:
+        st.error(message)
+    else:
+        errors.append(message)
+
+# --- Anthropic API Interaction ---
+def call_anthropic_api(client, prompt, raw_text_chunk=None, stage="call", model=planner.SYNTHESIS_MODEL, tool=None, max_tokens=4096,
+                       on_text=None, prefill=None, should_stop=None, budget=None, system=None, continuation=False):
+    """
+    Calls the Anthropic API as the `system` persona, streaming text to `on_text` or
+    returning the forced `tool`'s input. Hedging, retries and budgets are applied per
+    attempt (see hedging.race and budgets); a cut-off answer ends with TRUNCATED_NOTE.
+    """
+    if raw_text_chunk:
+        full_content = f"{prompt}\n\nHere is the data chunk to analyze:\n```text\n{raw_text_chunk}\n```"
+    else:
+        full_content = prompt
+
+    messages = [{"role": "user", "content": full_content}]
+    if prefill:
+        # The API rejects an assistant turn that ends in whitespace; the stripped tail comes back in the continuation
+        prefill = prefill.rstrip()
+        messages.append({"role": "assistant", "content": prefill})
+
+    import anthropic  # Deferred so a cold start or rerun never pays for the SDK import
+    retryable_errors = (anthropic.RateLimitError, anthropic.APIConnectionError, anthropic.InternalServerError)
+    tool_args = {"tools": [tool], "tool_choice": {"type": "tool", "name": tool["name"]}} if tool else {}
+    if system:
+        tool_args["system"] = system
+    if budget:
+        max_tokens = budgets.continuation_tokens(budget, prefill) if prefill else budget["max_tokens"]
+        if budget["stop_sequences"]:
+            tool_args["stop_sequences"] = budget["stop_sequences"]
+    deadline = hedging.call_deadline(stage)
+
+    def run_lane(lane):
+        stopped = False
+        with client.messages.stream(
+            model=model,
+            max_tokens=max_tokens,
+            messages=messages,
+            timeout=max(1.0, deadline - time.perf_counter()),
+            **tool_args
+        ) as stream:
+            lane.opened(stream)
+            for event in stream:
+                if event.type == "content_block_delta":
+                    lane.token(event.delta.text if event.delta.type == "text_delta" else None)
+                if lane.cancelled.is_set() or (should_stop and should_stop()):
+                    stopped = True
+                    break
+            return (stream.current_message_snapshot if stopped else stream.get_final_message()), stopped
+
+    with tracing.span(stage, prompt_chars=len(full_content)) as attrs:
+        for attempt in range(MAX_RETRIES + 1):
+            attrs["retries"] = attempt
+            try:
+                message, stopped = hedging.race(
+                    run_lane, stage, model=model, deadline=deadline,
+                    streaming=tool is None, on_text=on_text, attrs=attrs
+                )
+                if stopped:
+                    # The race stops a streamed winner at the deadline; should_stop ends a draft on purpose
+                    attrs["stop_reason"] = "timed_out" if attrs.get("timed_out") else "stopped_early"
+                else:
+                    attrs["stop_reason"] = message.stop_reason
+                tracing.record_usage(attrs, model, message.usage, retries=attempt)
+                attrs["max_tokens"] = max_tokens
+                if budget:
+                    budgets.record(attrs, budget, model, message.usage.output_tokens, attrs["stop_reason"], prefill)
+                if tool and message.stop_reason == "max_tokens" and max_tokens < budgets.MAX_OUTPUT_TOKENS and attempt < MAX_RETRIES:
+                    # Cut-off records are incomplete; ask again with room to finish
+                    max_tokens = min(budgets.MAX_OUTPUT_TOKENS, max_tokens * 2)
+                    continue
+                truncated = attrs["stop_reason"] in ("max_tokens", "timed_out")
+                attrs["truncated"] = truncated
+                if tool:
+                    result = next((block.input for block in message.content if block.type == "tool_use"), None)
+                    if truncated and result is not None:
+                        result = {**result, extraction.TRUNCATED: True}  # Usable for this report, never cached
+                    return result
+                text = (prefill or "") + (message.content[0].text if message.content else "")
+                if not truncated:
+                    return text
+                if continuation or attrs["stop_reason"] == "timed_out" or max_tokens >= budgets.MAX_OUTPUT_TOKENS:
+                    return text + TRUNCATED_NOTE
+                # Cut off below the hard ceiling: carry on from where the answer stops
+                room = {"max_tokens": budgets.MAX_OUTPUT_TOKENS}
+                continued = call_anthropic_api(
+                    client, prompt, raw_text_chunk=raw_text_chunk, stage=stage, model=model,
+                    max_tokens=budgets.continuation_tokens(room, text), on_text=on_text, prefill=text,
+                    should_stop=should_stop, budget=budget and {**budget, **room}, system=system, continuation=True
+                )
+                return continued if continued is not None else text + TRUNCATED_NOTE
+            except hedging.StageTimeout as e:
+                tracing.mark_error(attrs, str(e))
+                if tool:
+                    raise  # The map step goes on without this chunk
+                _report_error(f"Anthropic API Error: {e}")
+                return None
+            except retryable_errors as e:
+                if attempt < MAX_RETRIES and time.perf_counter() + 2 ** attempt < deadline:
+                    if on_text:
+                        on_text(None)
+                    time.sleep(2 ** attempt)
+                    continue
+                _report_error(f"Anthropic API Error: {e}")
+                tracing.mark_error(attrs, str(e))
+                return None
+            except anthropic.APIError as e:
+                _report_error(f"Anthropic API Error: {e}")
+                tracing.mark_error(attrs, str(e))
+                return None
+            except Exception as e:
+                _report_error(f"An unexpected error occurred: {e}")
+                tracing.mark_error(attrs, str(e))
+                return None
+
+def stream_text(client, content, stage, model, max_tokens, error_prefix, **attributes):
+    """
+    Yields the text of one streamed answer to `content`, for st.write_stream, traced
+    as `stage`. Transient failures are retried until the first text has arrived.
+    """
+    import anthropic  # Deferred so a cold start or rerun never pays for the SDK import
+    retryable_errors = (anthropic.RateLimitError, anthropic.APIConnectionError, anthropic.InternalServerError)
+    with tracing.span(stage, **attributes) as attrs:
+        start = time.perf_counter()
+        for attempt in range(MAX_RETRIES + 1):
+            attrs["retries"] = attempt
+            started = False
+            try:
+                with client.messages.stream(
+                    max_tokens=max_tokens,
+                    model=model,
+                    messages=[{"role": "user", "content": content}]
+                ) as stream:
+                    for text in stream.text_stream:
+                        if not started:
+                            started = True
+                            attrs["ttft_ms"] = round((time.perf_counter() - start) * 1000, 2)
+                        yield text
+                    tracing.record_usage(attrs, model, stream.get_final_message().usage, retries=attempt)
+                return
+            except retryable_errors as e:
+                if not started and attempt < MAX_RETRIES:
+                    time.sleep(2 ** attempt)
+                    continue
+                st.error(f"{error_prefix}: {e}")
+                tracing.mark_error(attrs, str(e))
+                return
+            except Exception as e:
+                st.error(f"{error_prefix}: {e}")
+                tracing.mark_error(attrs, str(e))
+                return
+
+def get_api_key():
+    """Reads the key from Streamlit secrets on first use rather than at import time."""
+    try:
+        return st.secrets["ANTHROPIC_KEY"]
+    except (KeyError, FileNotFoundError):
+        return None
+
+@st.cache_resource
+def _build_client(api_key):
+    import anthropic  # Deferred so a cold start never pays for the SDK import
+    return anthropic.Anthropic(api_key=api_key, max_retries=0)
+
+def create_client():
+    """Builds (once per process) the Anthropic client, reporting a missing key or setup failure in the UI."""
+    api_key = get_api_key()
+    if not api_key or "YOUR_API_KEY" in api_key:
+        st.error("Please provide a valid Anthropic API key as ANTHROPIC_KEY in the Streamlit secrets.")
+        return None
+
+    try:
+        return _build_client(api_key)
+    except Exception as e:
+        st.error(f"Failed to initialize Anthropic client: {e}")
+        return None
+
+# --- Map and Synthesis Inputs ---
+def extract_cached(client, prompt, text_chunk, model, system=None):
+    """Records a chunk with the extraction tool; results are cached on disk by model, prompt and chunk."""
+    key = extraction.cache_key(model, prompt, text_chunk)
+    cached = extraction.load_cached(key)
+    if cached is not None:
+        return cached
+    result = call_anthropic_api(
+        client, prompt, raw_text_chunk=text_chunk, stage="map", model=model, system=system,
+        tool=extraction.EXTRACTION_TOOL, budget=budgets.map_budget(text_chunk, model, ceiling=MAP_MAX_TOKENS)
+    )
+    if result:
+        extraction.save_cached(key, result)
+    return result
+
+def synthesis_context(partial_analyses, drive_list=None, total_parts=None):
+    """
+    Merges the per-chunk extractions for a synthesis prompt. Returns the rendered
+    dataset, how many chunks it holds, the prompt notes on missing chunks and drafts,
+    and the stage to trace the call as.
+    """
+    # Chunks that timed out stay in place as None so the prompt can name the gaps
+    available = [analysis for analysis in partial_analyses if analysis is not None]
+    missing_parts = [i + 1 for i, analysis in enumerate(partial_analyses) if analysis is None]
+    merged = extraction.merge_extractions(available)
+    if drive_list:
+        drives.attach_drives(merged, drive_list)
+    # A draft over the opening chunks only, written while the rest are still being mapped
+    partial = bool(total_parts) and total_parts > len(partial_analyses)
+    notes = [
+        speculative.draft_note(len(partial_analyses), total_parts) if partial else "",
+        hedging.missing_note(missing_parts, total_parts or len(partial_analyses)),
+    ]
+    return {
+        "dataset": extraction.render_dataset(merged),
+        "parts": len(available),
+        "notes": "\n".join(note for note in notes if note),
+        "stage": "draft" if partial else "reduce",
+    }
+
+# --- Map Step ---
+def run_map_step(map_chunk, text_chunks, model, progress_bar, total_steps, report_attrs, labels):
+    """
+    Extracts records from each chunk in order with `map_chunk(chunk, part_num,
+    total_parts, model)`. A chunk that runs out of time is left as None so the
+    synthesis can name the gap. Returns the extractions, or None if a chunk fails
+    outright or none came back.
+    """
+    partial_analyses = []
+    for i, chunk in enumerate(text_chunks):
+        progress_text = f"Step {i+1}/{total_steps}: " + labels["map_step"].format(part=i + 1, total=len(text_chunks))
+        progress_bar.progress((i + 1) / total_steps, text=progress_text)
+
+        try:
+            analysis = map_chunk(chunk, i + 1, len(text_chunks), model)
+        except hedging.StageTimeout:
+            st.warning(f"Chunk {i+1} did not come back in time; the report will be written without it.")
+            report_attrs["missing_chunks"] = report_attrs.get("missing_chunks", 0) + 1
+            partial_analyses.append(None)
+            continue
+        if analysis:
+            partial_analyses.append(analysis)
+        else:
+            st.error(f"Failed to analyze chunk {i+1}. Aborting.")
+            tracing.mark_error(report_attrs, f"chunk {i+1} failed")
+            return None
+    if not any(partial_analyses):
+        st.error("No chunk came back in time. Aborting.")
+        tracing.mark_error(report_attrs, "every chunk timed out")
+        return None
+    return partial_analyses
+
+def run_speculative_step(map_chunk, synthesize, text_chunks, model, progress_bar, report_attrs, clip_refs, labels):
+    """
+    Maps every chunk concurrently and starts streaming the report from the opening
+    chunks while the rest are still running; `synthesize` is called as in
+    speculative.reduce_early. Returns (report, extractions); both are None if a chunk fails.
+    """
+    total = len(text_chunks)
+    map_jobs = [
+        lambda i=i, chunk=chunk: map_chunk(chunk, i + 1, total, model)
+        for i, chunk in enumerate(text_chunks)
+    ]
+
+    def on_progress(done, total_parts):
+        progress_bar.progress(done / (total_parts + 1), text=labels["streaming"].format(done=done, total=total_parts))
+
+    report_attrs["speculative"] = True
+    placeholder = st.empty()
+    with deferred_errors() as errors:
+        report, extractions = speculative.reduce_early(
+            map_jobs, synthesize,
+            on_text=lambda text: placeholder.markdown(clip_refs.expand(text)),
+            on_progress=on_progress,
+        )
+    placeholder.empty()
+    for message in dict.fromkeys(errors):
+        st.error(message)
+    if extractions is None:
+        st.error("Failed to analyze a chunk. Aborting.")
+        tracing.mark_error(report_attrs, "chunk failed")
+        return None, None
+    missing = [i + 1 for i, analysis in enumerate(extractions) if analysis is None]
+    if missing:
+        st.warning(f"Chunks {', '.join(map(str, missing))} did not come back in time; the report was written without them.")
+        report_attrs["missing_chunks"] = len(missing)
+    return report, extractions
+
+# --- Single Report ---
+def run_report(game, fields, labels, write_single, map_chunk, write_report, report_attrs,
+               speculate=False, validate_clips=True, prefetch_previews=False):
+    """
+    Builds one report: serializes the `fields` of `game`, plans the run, then writes it
+    with `write_single(game_text, model)` when the game fits in one request, or maps it
+    with `map_chunk` and writes it with `write_report(extractions, model, drive_list,
+    **stream_options)`. Returns {"report", "clips", "previews"}, or None when a step
+    failed and said so.
+    """
+    # 1. Serialize only the fields this report reads, with video URLs swapped for clip ids
+    clip_refs = projection.ClipRefs()
+    serialized = projection.serialize_drives(game, fields, clip_refs)
+    game_text = serialized["text"]
+    manifest = clips.build_manifest(game, clip_refs, serialized["drives"])
+    report_attrs["clips"] = len(manifest)
+    thumbnails = clips.start_prefetch(manifest) if prefetch_previews else None
+
+    # 2. Plan the run: one call for small games, N chunks on the map model for large ones
+    plan = planner.plan_report(game, serialized=game_text)
+    report_attrs["strategy"] = plan["strategy"]
+    report_attrs["num_chunks"] = plan["num_chunks"]
+    st.caption(planner.describe_plan(plan))
+
+    if plan["strategy"] == "single":
+        with st.spinner(labels["single"]):
+            report = write_single(game_text, plan["synthesis_model"])
+    else:
+        # 3. Pack whole drives into text chunks (an export without plays is split by line)
+        text_chunks = drives.chunk_game(serialized, plan["num_chunks"])
+        if not text_chunks:
+            st.error("Failed to split game data into text chunks. Aborting.")
+            tracing.mark_error(report_attrs, "chunking failed")
+            return None
+
+        total_steps = len(text_chunks) + 1  # N chunks + 1 synthesis step
+        progress_bar = st.progress(0, text=labels["map_start"])
+        if speculate:
+            # Map concurrently and stream the opening of the report from the early chunks
+            def synthesize(extractions, total_parts, prefill, emit, should_stop):
+                return write_report(
+                    extractions, plan["synthesis_model"], serialized["drives"],
+                    on_text=emit, total_parts=total_parts, prefill=prefill, should_stop=should_stop
+                )
+            report, partial_analyses = run_speculative_step(
+                map_chunk, synthesize, text_chunks, plan["map_model"], progress_bar, report_attrs, clip_refs, labels
+            )
+            if partial_analyses is None:
+                return None
+        else:
+            # 4. "Map" step: extract records from each chunk in order
+            partial_analyses = run_map_step(map_chunk, text_chunks, plan["map_model"], progress_bar, total_steps, report_attrs, labels)
+            if partial_analyses is None:
+                return None
+
+            # 5. "Reduce" step: write the report from the merged records
+            progress_bar.progress(1.0, text=f"Step {total_steps}/{total_steps}: " + labels["synthesize_one"])
+            report = write_report(partial_analyses, plan["synthesis_model"], serialized["drives"])
+        progress_bar.empty()
+
+    # 6. Resolve clip links against the manifest
+    report, linked_clips = clips.finalize_report(report, manifest, clip_refs, validate=validate_clips)
+    return {"report": report, "clips": linked_clips, "previews": thumbnails.result() if thumbnails else {}}
+
+# --- Multi-Report Fan-Out ---
+def generate_all_reports(app, game, names, report_fields, labels, write_single, map_chunk, write_report,
+                         validate_clips=True, prefetch_previews=False):
+    """
+    Builds several report types from one pass over the game. The game is serialized
+    with the union of the fields the selected reports read and mapped once with
+    `map_chunk(chunk, part_num, total_parts, model)`; then one call per report runs
+    concurrently, each streaming into its own tab: `write_report(name, extractions,
+    model, drive_list, on_text)`, or `write_single(name, game_text, model, on_text)`
+    when the game fits in one request.
+    """
+    with tracing.start_trace(app, mode="All", modes=",".join(names)) as report_attrs, hedging.report_deadline():
+        home_team = game.get('home_team', 'N/A')
+        away_team = game.get('away_team', 'N/A')
+        st.subheader(labels["subheader"].format(away=away_team, home=home_team))
+        report_attrs["game"] = f"{away_team} at {home_team}"
+
+        clip_refs = projection.ClipRefs()
+        fields = projection.fields_for(*(report_fields[name] for name in names))
+        serialized = projection.serialize_drives(game, fields, clip_refs)
+        game_text = serialized["text"]
+        manifest = clips.build_manifest(game, clip_refs, serialized["drives"])
+        report_attrs["clips"] = len(manifest)
+        thumbnails = clips.start_prefetch(manifest) if prefetch_previews else None
+
+        plan = planner.plan_report(game, serialized=game_text)
+        report_attrs["strategy"] = plan["strategy"]
+        report_attrs["num_chunks"] = plan["num_chunks"]
+        st.caption(f"{planner.describe_plan(plan)} Shared by {len(names)} reports.")
+
+        if plan["strategy"] == "single":
+            def make_job(name):
+                return lambda emit: write_single(name, game_text, plan["synthesis_model"], emit)
+        else:
+            text_chunks = drives.chunk_game(serialized, plan["num_chunks"])
+            if not text_chunks:
+                st.error("Failed to split game data into text chunks. Aborting.")
+                tracing.mark_error(report_attrs, "chunking failed")
+                return
+            total_steps = len(text_chunks) + 1
+            progress_bar = st.progress(0, text=labels["map_start"])
+            partial_analyses = run_map_step(map_chunk, text_chunks, plan["map_model"], progress_bar, total_steps, report_attrs, labels)
+            if partial_analyses is None:
+                return
+            progress_bar.progress(1.0, text=f"Step {total_steps}/{total_steps}: " + labels["synthesize_all"].format(count=len(names)))
+
+            def make_job(name):
+                return lambda emit: write_report(name, partial_analyses, plan["synthesis_model"], serialized["drives"], emit)
+
+        errors = {name: [] for name in names}
+
+        def collecting(name):
+            job = make_job(name)
+
+            def run(emit):
+                with deferred_errors(errors[name]):
+                    return job(emit)
+            return run
+
+        tabs = dict(zip(names, st.tabs([labels["tab"].format(name=name) for name in names])))
+        placeholders = {name: tabs[name].empty() for name in names}
+        reports = fanout.fan_out(
+            {name: collecting(name) for name in names},
+            on_text=lambda name, text: placeholders[name].markdown(clip_refs.expand(text)),
+        )
+        if plan["strategy"] != "single":
+            progress_bar.empty()
+
+        previews = thumbnails.result() if thumbnails else {}
+        for name in names:
+            final_report, linked_clips = clips.finalize_report(reports[name], manifest, clip_refs, validate=validate_clips)
+            with tabs[name]:
+                for message in dict.fromkeys(errors[name]):
+                    st.error(message)
+                if final_report:
+                    placeholders[name].markdown(final_report)
+                    if labels.get("download"):
+                        st.download_button(
+                            label=labels["download"],
+                            data=final_report,
+                            file_name=f"{name.replace(' ', '_')}_{away_team}_vs_{home_team}.md",
+                            mime="text/markdown",
+                            key=f"download_{name}"
+                        )
+                    render_clip_gallery(linked_clips, previews)
+                else:
+                    placeholders[name].error(labels["failed"].format(name=name))
+                    tracing.mark_error(report_attrs, f"{name} synthesis failed")
+
+# --- Clip Previews ---
+def render_clip_gallery(entries, thumbnails):
+    """Shows the clips linked in a report with their cached thumbnails and play details."""
+    if not entries:
+        return
+    with st.expander(f"🎬 Clips in this report ({len(entries)})"):
+        columns = st.columns(4)
+        for i, entry in enumerate(entries):
+            with columns[i % 4]:
+                if entry["ref"] in thumbnails:
+                    st.image(thumbnails[entry["ref"]], use_container_width=True)
+                details = [f"Play {entry['play_number']}", entry["off_formation"], entry["result"]]
+                if isinstance(entry["duration"], (int, float)):
+                    details.append(f"{entry['duration']:.0f}s")
+                st.caption(" · ".join(str(d) for d in details if d not in (None, "")))
+                st.markdown(f"[📹 Watch]({entry['url']})")
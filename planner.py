@@ -0,0 +1,60 @@
+import json
+import math
+import os
+
+import gamedata
+import tracing
+
+# --- Routing Configuration ---
+SYNTHESIS_MODEL = os.environ.get("FOOTBALL_SYNTHESIS_MODEL", "claude-sonnet-4-20250514")
+MAP_MODEL = os.environ.get("FOOTBALL_MAP_MODEL", "claude-3-5-haiku-20241022")
+
+CHARS_PER_TOKEN = 3  # Compact JSON lines (quotes, braces, short values) run about 3 characters a token; avoids a count_tokens round trip
+SINGLE_CALL_TOKEN_LIMIT = 60_000
+SINGLE_CALL_PLAY_LIMIT = 80
+TARGET_CHUNK_TOKENS = 30_000
+MAX_PLAYS_PER_CHUNK = 60
+MAX_CHUNKS = 8
+
+# --- Planning ---
+def estimate_tokens(text):
+    """Approximates the token count of a prompt payload from its character length."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+def plan_report(game_data, serialized=None):
+    """
+    Inspects a game and decides how to analyze it. Small games go to the synthesis
+    model in a single call; larger ones are split into enough chunks to keep each map
+    call under TARGET_CHUNK_TOKENS and MAX_PLAYS_PER_CHUNK, with the map step routed to
+    the cheaper MAP_MODEL. The plan is logged as a span for benchmarking.
+    """
+    with tracing.span("plan") as attrs:
+        if serialized is None:
+            serialized = json.dumps(game_data, indent=2)
+        plays = gamedata.count_plays(game_data)
+        est_tokens = estimate_tokens(serialized)
+
+        if est_tokens <= SINGLE_CALL_TOKEN_LIMIT and plays <= SINGLE_CALL_PLAY_LIMIT:
+            plan = {"strategy": "single", "num_chunks": 1, "map_model": None}
+        else:
+            by_tokens = math.ceil(est_tokens / TARGET_CHUNK_TOKENS)
+            by_plays = math.ceil(plays / MAX_PLAYS_PER_CHUNK)
+            num_chunks = min(MAX_CHUNKS, max(2, by_tokens, by_plays))
+            plan = {"strategy": "map_reduce", "num_chunks": num_chunks, "map_model": MAP_MODEL}
+
+        plan.update({
+            "plays": plays,
+            "chars": len(serialized),
+            "est_tokens": est_tokens,
+            "synthesis_model": SYNTHESIS_MODEL,
+        })
+        attrs.update(plan)
+        return plan
+
+def describe_plan(plan):
+    """One-line summary of a plan for display under the game header."""
+    if plan["strategy"] == "single":
+        return (f"{plan['plays']} plays, ~{plan['est_tokens']:,} tokens → single call "
+                f"on {plan['synthesis_model']}")
+    return (f"{plan['plays']} plays, ~{plan['est_tokens']:,} tokens → {plan['num_chunks']} chunks "
+            f"on {plan['map_model']}, synthesis on {plan['synthesis_model']}")
@@ -1,7 +1,13 @@
 import streamlit as st
-import pandas as pd
-import fitz  # PyMuPDF
-import anthropic # Use the Anthropic library
+
+import images
+import pipeline
+import templates
+import tracing
+import uploads
+
+MODEL_NAME = "claude-sonnet-4-20250514" # A powerful and fast model
+REPORT_TEMPLATE = "postgame/execution_report.v1.md"
 
 # --- Page Configuration ---
 st.set_page_config(
@@ -10,73 +16,148 @@ st.set_page_config(
     layout="wide"
 )
 
-# --- API Configuration ---
-# Configure the Anthropic client with the provided API key
-try:
-    # Use the specific API key provided by the user
-    api_key = st.secrets["ANTHROPIC_KEY"] 
-    if not api_key:
-        st.error("Anthropic API key not found. The key is missing from the script.")
-    else:
-        client = anthropic.Anthropic(api_key=api_key)
-except Exception as e:
-    st.error(f"Error configuring the API client. Details: {e}")
+# --- Session Memory ---
+def get_upload_store():
+    """The session's budgeted store of parsed uploads, created on first use."""
+    if "upload_store" not in st.session_state:
+        st.session_state.upload_store = uploads.SessionStore()
+    return st.session_state.upload_store
 
+def get_session_id():
+    """Streamlit's id for the current browser session, used to group memory metrics."""
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx else None
 
 # --- Helper Functions ---
 def extract_text_from_pdf(pdf_file):
-    """Extracts text from an uploaded PDF file."""
-    try:
-        # Open the PDF file from the uploaded bytes
-        pdf_document = fitz.open(stream=pdf_file.read(), filetype="pdf")
-        text = ""
-        # Iterate through each page and extract text
-        for page_num in range(len(pdf_document)):
-            page = pdf_document.load_page(page_num)
-            text += page.get_text()
+    """
+    Extracts text from an uploaded PDF file. The text is kept in the session's upload
+    store so sidebar reruns don't re-parse it; large files are parsed from a disk copy.
+    """
+    store = get_upload_store()
+    key = uploads.upload_key(pdf_file)
+    text = store.get(key)
+    if text is not None:
         return text
-    except Exception as e:
-        st.error(f"Error reading PDF file: {e}")
-        return None
+    with tracing.span("extract_text_from_pdf", file_name=pdf_file.name, bytes=pdf_file.size) as attrs:
+        try:
+            import fitz  # PyMuPDF, only loaded once a PDF is actually uploaded
+            spill_path = store.spill_upload(pdf_file)
+            attrs["spilled"] = spill_path is not None
+            # Open the PDF from disk when spilled, otherwise from the upload buffer
+            if spill_path:
+                pdf_document = fitz.open(spill_path)
+            else:
+                pdf_document = fitz.open(stream=pdf_file.getvalue(), filetype="pdf")
+            pages = []
+            # Iterate through each page and extract text
+            for page_num in range(len(pdf_document)):
+                page = pdf_document.load_page(page_num)
+                pages.append(page.get_text())
+            text = "".join(pages)
+            attrs["pages"] = len(pdf_document)
+            attrs["chars"] = len(text)
+            pdf_document.close()
+            store.put(key, text)
+            return text
+        except Exception as e:
+            st.error(f"Error reading PDF file: {e}")
+            tracing.mark_error(attrs, str(e))
+            return None
 
 def extract_text_from_multiple_pdfs(pdf_files):
     """Extracts and combines text from multiple PDF files."""
-    combined_text = ""
+    parts = []
     for i, pdf_file in enumerate(pdf_files):
         text = extract_text_from_pdf(pdf_file)
         if text:
-            combined_text += f"\n\n--- DOCUMENT {i+1}: {pdf_file.name} ---\n\n{text}"
-    return combined_text
+            parts.append(f"\n\n--- DOCUMENT {i+1}: {pdf_file.name} ---\n\n{text}")
+    return "".join(parts)
+
+def load_csv(csv_file):
+    """
+    Parses an uploaded CSV into a compact DataFrame (read in row chunks, numeric columns
+    downcast, repetitive text as categoricals), cached in the session's upload store.
+    """
+    store = get_upload_store()
+    key = uploads.upload_key(csv_file)
+    df = store.get(key)
+    if df is not None:
+        return df
+    with tracing.span("load_csv", file_name=csv_file.name, bytes=csv_file.size) as attrs:
+        spill_path = store.spill_upload(csv_file)
+        attrs["spilled"] = spill_path is not None
+        if not spill_path:
+            csv_file.seek(0)
+        df = uploads.read_csv_compact(spill_path or csv_file)
+        attrs["rows"] = len(df)
+        attrs["frame_bytes"] = uploads.frame_bytes(df)
+        store.put(key, df, attrs["frame_bytes"])
+        return df
+
+def frame_to_markdown(df, rows_per_slice=5000):
+    """Renders a DataFrame as one Markdown table, a slice of rows at a time."""
+    parts = []
+    for start in range(0, len(df), rows_per_slice):
+        table = df.iloc[start:start + rows_per_slice].to_markdown(index=False)
+        # Later slices continue the same table, so drop their header and rule lines
+        parts.append(table if start == 0 else table.split("\n", 2)[2])
+    return "\n".join(parts) if parts else df.to_markdown(index=False)
 
 def combine_csv_data(csv_files):
     """Combines multiple CSV files into a single formatted string."""
-    combined_data = ""
-    for i, csv_file in enumerate(csv_files):
-        try:
-            df = pd.read_csv(csv_file)
-            combined_data += f"\n\n--- GAME DATA FILE {i+1}: {csv_file.name} ---\n\n"
-            combined_data += df.to_markdown(index=False)
-        except Exception as e:
-            st.error(f"Error reading CSV file {csv_file.name}: {e}")
-    return combined_data
-
-def generate_report_stream(prompt_text):
-    """Generates the report by streaming the response from the Anthropic API."""
-    try:
-        # Use a streaming context manager for the Anthropic API call
-        with client.messages.stream(
-            max_tokens=4096,
-            model="claude-sonnet-4-20250514", # A powerful and fast model
-            messages=[
-                {"role": "user", "content": prompt_text}
-            ]
-        ) as stream:
-            # Yield each piece of text as it comes in
-            for text in stream.text_stream:
-                yield text
-    except Exception as e:
-        st.error(f"An error occurred during report generation: {e}")
-        yield "" # Return an empty generator in case of error
+    with tracing.span("combine_csv_data", files=len(csv_files)) as attrs:
+        parts = []
+        rows = 0
+        for i, csv_file in enumerate(csv_files):
+            try:
+                df = load_csv(csv_file)
+                rows += len(df)
+                parts.append(f"\n\n--- GAME DATA FILE {i+1}: {csv_file.name} ---\n\n")
+                parts.append(frame_to_markdown(df))
+            except Exception as e:
+                st.error(f"Error reading CSV file {csv_file.name}: {e}")
+        combined_data = "".join(parts)
+        attrs["rows"] = rows
+        attrs["chars"] = len(combined_data)
+        uploads.record_footprint(attrs, get_upload_store(), get_session_id())
+        return combined_data
+
+def prepare_uploaded_images(image_files):
+    """
+    Downscales, recompresses and hashes uploaded images on a thread pool. Payloads are
+    kept in the session's upload store, so reruns only process newly added images.
+    """
+    store = get_upload_store()
+    keyed = [(f"image:{uploads.upload_key(f)}", f) for f in image_files]
+    cached = {key: store.get(key) for key, _ in keyed}
+    payloads, errors = images.prepare_images(
+        [(key, f.name, f.getvalue) for key, f in keyed], cached=cached
+    )
+    for key, payload in payloads.items():
+        if cached.get(key) is None:
+            store.put(key, payload, len(payload["data"]))
+    for name, error in errors.items():
+        st.warning(f"Skipping image {name}: {error}")
+    return list(payloads.values())
+
+def generate_report_stream(prompt_text, image_payloads=None):
+    """
+    Generates the report by streaming the response from the Anthropic API. Selected
+    images go ahead of the prompt text as image blocks.
+    """
+    client = pipeline.create_client()
+    if client is None:
+        return
+    content = [{"type": "text", "text": prompt_text}]
+    if image_payloads:
+        note = f"The {len(image_payloads)} images above are screenshots from this game; use them as visual evidence where relevant.\n\n"
+        content = images.image_blocks(image_payloads) + [{"type": "text", "text": note + prompt_text}]
+    yield from pipeline.stream_text(
+        client, content, "report_stream", MODEL_NAME, 4096, "An error occurred during report generation",
+        prompt_chars=len(prompt_text), images=len(image_payloads or [])
+    )
 
 # --- Main Application UI ---
 st.title("🏈 Post-Game Execution Analysis Generator")
@@ -95,6 +176,7 @@ with st.sidebar:
     )
 
     scouting_report_text = ""
+    uploaded_pdfs = []
     if report_option == "Upload PDF":
         uploaded_pdfs = st.file_uploader("PDF Files", type="pdf", accept_multiple_files=True)
         if uploaded_pdfs:
@@ -118,6 +200,30 @@ with st.sidebar:
         accept_multiple_files=True
     )
 
+    image_payloads = prepare_uploaded_images(uploaded_images) if uploaded_images else []
+    selected_images, dropped_images = [], []
+    if image_payloads:
+        selected_images, dropped_images = images.select_images(image_payloads)
+        st.caption(
+            f"{len(selected_images)} of {len(image_payloads)} images will be sent "
+            f"(~{sum(p['tokens'] for p in selected_images)} of {images.IMAGE_TOKEN_BUDGET} image tokens)."
+        )
+        for payload, reason in dropped_images:
+            st.caption(f"• {payload['name']} left out: {reason}")
+
+    # Forget parsed uploads the user has removed, then show what the session holds
+    store = get_upload_store()
+    store.retain(
+        [uploads.upload_key(f) for f in list(uploaded_pdfs or []) + list(uploaded_csvs or [])]
+        + [f"image:{uploads.upload_key(f)}" for f in uploaded_images or []]
+    )
+    footprint = store.footprint()
+    st.caption(
+        f"Session memory: {footprint['session_memory_bytes'] / 1e6:.1f} MB parsed in memory, "
+        f"{footprint['session_spilled_bytes'] / 1e6:.1f} MB spilled to disk "
+        f"(budget {store.budget_bytes / 1e6:.0f} MB)"
+    )
+
 # --- Main Content Area for Report Generation and Display ---
 if st.button("🚀 Generate Post-Game Report", type="primary"):
     # Input validation
@@ -125,47 +231,31 @@ if st.button("🚀 Generate Post-Game Report", type="primary"):
         st.warning("Please provide all required inputs:  Scouting Report, and Game Data CSV.")
     else:
         with st.spinner("Analyzing data and generating your expert report..."):
-            try:
-                # Read and format the game data
-                game_data_str = combine_csv_data(uploaded_csvs)
-
-                # --- Construct the Final Prompt for the AI Model ---
-                final_prompt = f"""
-                ROLE: You are an expert football analyst and strategist. Your audience is the coaching staff of your_team_name. Your tone must be professional, concise, data-driven, and analytical, using the specific language of football strategy.
-
-                GOAL: Generate a comprehensive post-game execution report for the your_team_name vs. opponent_team_name game played on . The report's primary purpose is to analyze how effectively your_team_name executed its pre-game plan by comparing the objectives from the scouting report against the actual outcomes from the game data.
-
-                INSTRUCTIONS:
-                1.  **Analyze the Inputs**: Thoroughly review the [PRE-GAME SCOUTING REPORT] to identify the specific "Keys to Success," player assessments, and strategic vulnerabilities. Then, use the [GAME DATA] as the source of truth for what actually happened.
-                2.  **Structure the Report**: Organize the output into the following sections:
-                    -   **Post-Game Overview**: A high-level debrief of the game and the overall success of the game plan.
-                    -   **Defensive Execution Analysis**: A detailed breakdown of how the defense performed against its specific keys.
-                    -   **Offensive Execution Analysis**: A detailed breakdown of how the offense performed against its specific keys.
-                3.  **Core Analysis Requirement**: For each "Key to Success" (for both offense and defense), you MUST:
-                    -   State the original key from the scouting report.
-                    -   Provide a clear, conclusive verdict on its execution (e.g., "Executed to Perfection," "Successfully Executed," "Mixed Results," "Failed to Execute").
-                    -   Present specific, quantitative evidence from the [GAME DATA] to justify your verdict. Heavily rely on data; integrate Key Performance Indicators (KPIs) directly into your analysis.
-                    -   Integrate Scouting Language: You MUST incorporate specific phrases, player names, and assessments directly from the scouting report into your analysis to demonstrate a clear link between the plan and the performance.
-                    - Make clever use of text formating to make the report more readable and engaging.
-                ---
-                [PRE-GAME SCOUTING REPORT]
-                ---
-                {scouting_report_text}
-
-                ---
-                [GAME DATA]
-                ---
-                {game_data_str}
-                """
-
-                # Generate and display the report
-                st.success("Analysis complete! Here is your report:")
-                report_container = st.container(border=True)
+            with tracing.start_trace("postgame", mode="Post-Game") as report_attrs:
+                try:
+                    # Read and format the game data
+                    game_data_str = combine_csv_data(uploaded_csvs)
+
+                    # --- Construct the Final Prompt for the AI Model ---
+                    final_prompt = templates.render(
+                        REPORT_TEMPLATE,
+                        scouting_report_text=scouting_report_text,
+                        game_data_str=game_data_str,
+                    )
+
+                    uploads.record_footprint(report_attrs, get_upload_store(), get_session_id())
+                    report_attrs["images"] = len(selected_images)
+                    report_attrs["image_tokens"] = sum(p["tokens"] for p in selected_images)
+
+                    # Generate and display the report
+                    st.success("Analysis complete! Here is your report:")
+                    report_container = st.container(border=True)
                 
-                with report_container:
-                  response_stream = generate_report_stream(final_prompt)
-                  if response_stream:
-                      st.write_stream(response_stream)
+                    with report_container:
+                      response_stream = generate_report_stream(final_prompt, selected_images)
+                      if response_stream:
+                          st.write_stream(response_stream)
 
-            except Exception as e:
-                st.error(f"A critical error occurred: {e}")
+                except Exception as e:
+                    st.error(f"A critical error occurred: {e}")
+                    tracing.mark_error(report_attrs, str(e))
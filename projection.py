@@ -0,0 +1,158 @@
+import json
+import re
+
+import drives
+import gamedata
+import tracing
+
+# --- Field Declarations ---
+# breakdownData columns every report needs to place a play in the game.
+BASE_FIELDS = ("PLAY #", "QTR", "SERIES #", "DN", "DIST", "YARD LN", "HASH", "PLAY TYPE", "RESULT", "GN/LS", "TEAM", "OPP TEAM")
+FORMATION_FIELDS = ("OFF FORM", "DEF FORM", "PERSONNEL", "BACKFIELD", "MOTION", "OFF PLAY", "PLAY DIR")
+DEFENSE_FIELDS = ("DEF FORM", "DEF FRONT", "COVERAGE", "BLITZ", "DEF PLAY")
+SPECIAL_TEAMS_FIELDS = ("ODK", "KICK YDS", "RET YDS", "RETURNER", "KICKER")
+DESCRIPTION_FIELDS = ("PLAY DESC", "DESCRIPTION", "NOTES", "PENALTY")
+
+CLIP_REF_NOTE = (
+    "Video clips are referenced by short ids such as clip:12. Copy them exactly as the link "
+    "target, e.g. [📹 Watch Play](clip:12); they are expanded to full URLs afterwards."
+)
+
+DRIVE_NOTE = (
+    "Plays are grouped by drive. Each drive starts with a line holding its drive key, team, "
+    "start yard line, yards, time and result, computed from the whole game; the play lines "
+    "that follow belong to that drive."
+)
+
+VIDEO_EXTENSIONS = (".mp4", ".m3u8", ".mov", ".webm")
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".gif")
+
+_CLIP_REF_PATTERN = re.compile(r"clip:(\d+)")
+
+# --- Clip References ---
+class ClipRefs:
+    """Hands out short `clip:N` ids for video URLs and expands them back after generation."""
+
+    def __init__(self, urls=None):
+        self.urls = []
+        self._ids = {}
+        for url in urls or []:
+            self.ref(url)
+
+    def ref(self, url):
+        if url not in self._ids:
+            self.urls.append(url)
+            self._ids[url] = f"clip:{len(self.urls)}"
+        return self._ids[url]
+
+    def url_for(self, ref):
+        match = _CLIP_REF_PATTERN.fullmatch(ref)
+        if not match:
+            return None
+        index = int(match.group(1)) - 1
+        return self.urls[index] if 0 <= index < len(self.urls) else None
+
+    def expand(self, text):
+        """Replaces every known clip id in model output with its original URL."""
+        if not text:
+            return text
+        return _CLIP_REF_PATTERN.sub(lambda m: self.url_for(m.group(0)) or m.group(0), text)
+
+def _is_url(value):
+    return isinstance(value, str) and value.startswith(("http://", "https://"))
+
+def _find_urls(node):
+    """Collects URL strings anywhere inside a play record, in file order."""
+    urls = []
+    if isinstance(node, dict):
+        for value in node.values():
+            urls.extend(_find_urls(value))
+    elif isinstance(node, list):
+        for value in node:
+            urls.extend(_find_urls(value))
+    elif _is_url(node):
+        urls.append(node)
+    return urls
+
+def video_urls(play):
+    """
+    The clip URLs of a play. When some URLs are recognizably video files, images and
+    other links are left out; otherwise every URL found is assumed to be a clip.
+    """
+    urls = list(dict.fromkeys(_find_urls(play)))
+    videos = [url for url in urls if url.split("?")[0].lower().endswith(VIDEO_EXTENSIONS)]
+    return videos or urls
+
+def thumbnail_url(play):
+    """The first image URL attached to a play, used as a clip preview. None when there is none."""
+    return next((url for url in _find_urls(play) if url.split("?")[0].lower().endswith(IMAGE_EXTENSIONS)), None)
+
+# --- Projection ---
+def project_play(play, fields, clip_refs):
+    """
+    Keeps only the declared breakdownData columns of a play (matched case-insensitively,
+    empty values dropped) and swaps its video URLs for clip ids. A play with none of the
+    declared columns keeps its full breakdown so an unfamiliar export is never blanked.
+    """
+    breakdown = play["breakdownData"]
+    by_upper = {key.upper(): key for key in breakdown}
+    projected = {}
+    for field in fields:
+        key = by_upper.get(field.upper())
+        if key is None:
+            continue
+        value = breakdown[key]
+        if value in (None, "", [], {}):
+            continue
+        projected[field] = value
+    if not projected:
+        projected = {k: v for k, v in breakdown.items() if not _is_url(v)}
+
+    clips = [clip_refs.ref(url) for url in video_urls(play)]
+    if clips:
+        projected["clips"] = clips
+    return projected
+
+def game_header(game_data):
+    """Top-level scalar fields of a game (teams, date, score), minus URLs."""
+    return {
+        key: value for key, value in game_data.items()
+        if not isinstance(value, (dict, list)) and not _is_url(value) and value not in (None, "")
+    }
+
+def drive_block(drive, fields, clip_refs):
+    """A drive from drives.build_drives as its summary line followed by its projected plays."""
+    lines = [drives.summary_line(drive)]
+    for play in drive["plays"]:
+        lines.append(json.dumps(project_play(play, fields, clip_refs), ensure_ascii=False, separators=(",", ":")))
+    return "\n".join(lines)
+
+def serialize_drives(game_data, fields, clip_refs):
+    """
+    Serializes a game for the model as compact JSON lines: a header line with the game
+    fields, then each drive as a summary line followed by its plays holding only
+    `fields`. Returns a dict with the header line, the drives, one text block per drive
+    and the full text.
+    """
+    with tracing.span("serialize_game", fields=len(fields)) as attrs:
+        header = json.dumps(game_header(game_data), ensure_ascii=False, separators=(",", ":"))
+        drive_list = drives.build_drives(list(gamedata.iter_plays(game_data)))
+        blocks = [drive_block(drive, fields, clip_refs) for drive in drive_list]
+        if blocks:
+            text = "\n".join([header] + blocks)
+        else:
+            # No recognizable plays means an unfamiliar export; send it whole rather than empty
+            text = json.dumps(game_data, indent=2)
+        attrs["projected"] = bool(blocks)
+        attrs["drives"] = len(drive_list)
+        attrs["chars"] = len(text)
+        attrs["clips"] = len(clip_refs.urls)
+        return {"header": header, "drives": drive_list, "blocks": blocks, "text": text}
+
+def serialize_game(game_data, fields, clip_refs):
+    """Serialized text of a game; see serialize_drives."""
+    return serialize_drives(game_data, fields, clip_refs)["text"]
+
+def fields_for(*groups):
+    """Merges field groups into one ordered tuple without duplicates."""
+    return tuple(dict.fromkeys(field for group in groups for field in group))
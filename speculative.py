@@ -0,0 +1,151 @@
+import concurrent.futures
+import contextvars
+import math
+import os
+import queue
+import re
+import threading
+import time
+
+import hedging
+import tracing
+
+# --- Configuration ---
+# Share of the leading chunks that must be back before a draft synthesis starts
+LEAD_FRACTION = float(os.environ.get("FOOTBALL_SPECULATIVE_LEAD", 0.5))
+# A kept draft ends at a paragraph break; a heading just before the cut is dropped with it
+_HEADING_TAIL = re.compile(r"\n#+ [^\n]*\s*$")
+
+def draft_note(available_parts, total_parts):
+    """Prompt text telling the model it only has the opening parts of the game so far."""
+    return (
+        f"Only the first {available_parts} of {total_parts} parts have been analyzed so far; the rest of the game is still being processed. "
+        "Write the report in chronological order and cover only what this data shows. "
+        "Stop once the covered drives are done: do not write whole-game conclusions, final takeaways or a summary yet."
+    )
+
+def trim_draft(text):
+    """
+    The part of a draft safe to keep as the opening of the final report: everything up
+    to its last paragraph break, minus a trailing heading whose section never started.
+    """
+    if not text:
+        return ""
+    cut = text.rfind("\n\n")
+    if cut <= 0:
+        return ""
+    kept = text[:cut].rstrip()
+    while _HEADING_TAIL.search("\n" + kept):
+        kept = kept[:kept.rfind("\n")].rstrip() if "\n" in kept else ""
+    return kept
+
+# --- Speculative Reduce ---
+def _timed_out(future):
+    return isinstance(future.exception(), hedging.StageTimeout)
+
+def _outcome(future):
+    """A finished map job's extraction, or None for a failure or a chunk that timed out."""
+    return None if future.exception() else future.result()
+
+def reduce_early(map_jobs, synthesize, on_text=None, on_progress=None, lead_fraction=LEAD_FRACTION, poll_seconds=0.1):
+    """
+    Runs the map jobs concurrently and starts streaming the synthesis before they all
+    return. `map_jobs` are zero-argument callables in chronological chunk order, each
+    returning an extraction or None on failure; a job that raises
+    hedging.StageTimeout leaves a None gap in the extractions instead.
+    `synthesize(extractions, total_parts, prefill, emit, should_stop)` makes one
+    reduce call and returns its full text.
+
+    Once the leading `lead_fraction` of chunks is back, a draft synthesis streams from
+    them. When the last chunk arrives the draft is stopped, trimmed back to its last
+    complete paragraph and handed to the final synthesis over every chunk as the start
+    of its answer, which the model continues. `on_text(text_so_far)` and
+    `on_progress(done, total)` are only called on the calling thread. Returns
+    (report, extractions); both are None when a chunk fails or none came back, and
+    report is None when the final call fails.
+    """
+    total = len(map_jobs)
+    lead = max(1, math.ceil(total * lead_fraction))
+    updates = queue.Queue()
+    stop = threading.Event()
+    buffer = {"text": "", "base": ""}
+
+    def emit(text):
+        updates.put(text)
+
+    def drain(timeout):
+        try:
+            batch = [updates.get(timeout=timeout)]
+        except queue.Empty:
+            return
+        while not updates.empty():
+            batch.append(updates.get_nowait())
+        for text in batch:
+            # None means a retried call starts over from whatever it was prefilled with
+            buffer["text"] = buffer["base"] if text is None else buffer["text"] + text
+        if not buffer.get("first_at") and buffer["text"]:
+            buffer["first_at"] = time.perf_counter()
+        if on_text:
+            on_text(buffer["text"])
+
+    def wait_for(future):
+        while not future.done():
+            drain(poll_seconds)
+        drain(0)
+        return future.result()
+
+    with tracing.span("speculative_reduce", parts=total, lead_parts=lead) as attrs:
+        start = time.perf_counter()
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=total + 1)
+        try:
+            map_futures = [executor.submit(contextvars.copy_context().run, job) for job in map_jobs]
+            draft_future = None
+            pending = set(map_futures)
+            while pending:
+                finished, pending = concurrent.futures.wait(pending, timeout=poll_seconds, return_when=concurrent.futures.FIRST_COMPLETED)
+                failed = sorted(map_futures.index(f) + 1 for f in finished if _outcome(f) is None and not _timed_out(f))
+                if failed:
+                    stop.set()
+                    tracing.mark_error(attrs, f"chunk {failed[0]} failed")
+                    attrs["failed_chunk"] = failed[0]
+                    return None, None
+                if finished and on_progress:
+                    on_progress(total - len(pending), total)
+                if draft_future is None and pending and all(f.done() for f in map_futures[:lead]):
+                    attrs["draft_start_ms"] = round((time.perf_counter() - start) * 1000, 2)
+                    draft_future = executor.submit(
+                        contextvars.copy_context().run, synthesize,
+                        [_outcome(f) for f in map_futures[:lead]], total, None, emit, stop.is_set
+                    )
+                drain(0)
+            extractions = [_outcome(f) for f in map_futures]
+            attrs["maps_done_ms"] = round((time.perf_counter() - start) * 1000, 2)
+            attrs["missing_chunks"] = sum(1 for f in map_futures if _timed_out(f))
+            if not any(extractions):
+                tracing.mark_error(attrs, "every chunk timed out")
+                return None, None
+
+            # Every chunk is back: cut the draft short and keep its complete paragraphs
+            stop.set()
+            kept = ""
+            if draft_future is not None:
+                kept = trim_draft(wait_for(draft_future))
+            attrs["speculated"] = draft_future is not None
+            attrs["draft_chars_kept"] = len(kept)
+            buffer["base"] = buffer["text"] = kept
+            if on_text:
+                on_text(kept)
+
+            final_future = executor.submit(
+                contextvars.copy_context().run, synthesize, extractions, total, kept or None, emit, None
+            )
+            report = wait_for(final_future)
+            if buffer.get("first_at"):
+                attrs["first_report_token_ms"] = round((buffer["first_at"] - start) * 1000, 2)
+            if report is None:
+                tracing.mark_error(attrs, "final synthesis failed")
+            return report, extractions
+        finally:
+            stop.set()
+            # Stragglers after a failed chunk finish in the background; nothing waits for them
+            executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,28 @@
+import functools
+import os
+import re
+from string import Template
+
+# --- Configuration ---
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "prompts")
+# Length targets written like "600–800 words" or "600-800 words"
+_WORD_RANGE = re.compile(r"(\d[\d,]*)\s*(?:–|-|to)\s*(\d[\d,]*)\s*words", re.IGNORECASE)
+
+# --- Loading ---
+@functools.lru_cache(maxsize=None)
+def load(name):
+    """
+    Reads a prompt template such as "eggball/tactical.v1.md" from the prompts directory.
+    Templates are read once per process; bump the version in the file name to change one.
+    """
+    with open(os.path.join(TEMPLATE_DIR, name), 'r', encoding='utf-8') as f:
+        return f.read()
+
+def render(name, **values):
+    """Loads a template and fills its $placeholders. Inserted values are not re-expanded."""
+    return Template(load(name)).safe_substitute(**values)
+
+def word_target(text):
+    """Upper bound of the first "600–800 words" style length target in a prompt, or None."""
+    match = _WORD_RANGE.search(text)
+    return int(match.group(2).replace(",", "")) if match else None
@@ -0,0 +1,167 @@
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# --- Configuration ---
+TRACE_FILE = os.environ.get("FOOTBALL_TRACE_FILE", "traces.jsonl")
+# How much of the end of the trace file the latency and budget trackers read at startup
+SEED_TAIL_BYTES = int(os.environ.get("FOOTBALL_TRACE_SEED_BYTES", 4_000_000))
+
+# USD per million tokens. Cache writes are billed at 1.25x input, cache reads at 0.1x input.
+MODEL_PRICING = {
+    "claude-sonnet-4-20250514": {"input": 3.00, "output": 15.00, "cache_write": 3.75, "cache_read": 0.30},
+    "claude-3-5-haiku-20241022": {"input": 0.80, "output": 4.00, "cache_write": 1.00, "cache_read": 0.08},
+}
+
+_current_trace = ContextVar("current_trace", default=None)
+_current_span = ContextVar("current_span", default=None)
+_write_lock = threading.Lock()
+_totals_lock = threading.Lock()
+
+# --- Export ---
+def _export(record):
+    """Appends a single span record to the local JSONL trace file."""
+    line = json.dumps(record, default=str)
+    with _write_lock:
+        with open(TRACE_FILE, 'a', encoding='utf-8') as f:
+            f.write(line + "\n")
+
+def _new_id(length):
+    return uuid.uuid4().hex[:length]
+
+# --- Spans ---
+@contextmanager
+def start_trace(app, mode=None, **attributes):
+    """
+    Opens the root span for one report. Every span opened inside it shares the
+    trace id, and the token/cost totals of the children are rolled up onto the root.
+    """
+    trace = {"trace_id": _new_id(32), "app": app, "mode": mode, "totals": _empty_totals()}
+    token = _current_trace.set(trace)
+    try:
+        with span("report", **attributes) as attrs:
+            yield attrs
+            attrs.update(trace["totals"])
+    finally:
+        _current_trace.reset(token)
+
+@contextmanager
+def span(name, **attributes):
+    """
+    Times a pipeline stage and exports it as an OpenTelemetry-style JSON record.
+    Yields a mutable attribute dict so the stage can attach counts as it runs.
+    """
+    trace = _current_trace.get()
+    parent = _current_span.get()
+    span_id = _new_id(16)
+    attrs = dict(attributes)
+    token = _current_span.set(span_id)
+    start_ns = time.time_ns()
+    start = time.perf_counter()
+    status = {"code": "OK"}
+    try:
+        yield attrs
+    except BaseException as e:
+        status = {"code": "ERROR", "message": str(e)}
+        raise
+    finally:
+        _current_span.reset(token)
+        if attrs.pop("_error", None):
+            status = {"code": "ERROR", "message": attrs.get("error", "")}
+        attrs["duration_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        _export({
+            "trace_id": trace["trace_id"] if trace else _new_id(32),
+            "span_id": span_id,
+            "parent_span_id": parent,
+            "name": name,
+            "app": trace["app"] if trace else None,
+            "mode": trace["mode"] if trace else None,
+            "start_time_unix_nano": start_ns,
+            "end_time_unix_nano": time.time_ns(),
+            "attributes": attrs,
+            "status": status,
+        })
+
+def mark_error(attrs, message):
+    """Flags a span as failed without raising, for stages that report errors via st.error."""
+    attrs["_error"] = True
+    attrs["error"] = message
+
+# --- Token Accounting ---
+def _empty_totals():
+    return {
+        "input_tokens": 0,
+        "output_tokens": 0,
+        "cache_creation_input_tokens": 0,
+        "cache_read_input_tokens": 0,
+        "cost_usd": 0.0,
+        "retries": 0,
+    }
+
+def estimate_cost(model, usage):
+    """Returns the USD cost of a call from its usage counts, or 0.0 for unknown models."""
+    price = MODEL_PRICING.get(model)
+    if not price:
+        return 0.0
+    cost = (
+        usage.get("input_tokens", 0) * price["input"]
+        + usage.get("output_tokens", 0) * price["output"]
+        + usage.get("cache_creation_input_tokens", 0) * price["cache_write"]
+        + usage.get("cache_read_input_tokens", 0) * price["cache_read"]
+    )
+    return round(cost / 1_000_000, 6)
+
+def record_usage(attrs, model, usage, retries=0):
+    """
+    Copies the token counts from an API response's `usage` onto a span and adds
+    them to the enclosing report's totals.
+    """
+    counts = {
+        "input_tokens": getattr(usage, "input_tokens", 0) or 0,
+        "output_tokens": getattr(usage, "output_tokens", 0) or 0,
+        "cache_creation_input_tokens": getattr(usage, "cache_creation_input_tokens", 0) or 0,
+        "cache_read_input_tokens": getattr(usage, "cache_read_input_tokens", 0) or 0,
+    }
+    counts["cost_usd"] = estimate_cost(model, counts)
+    counts["retries"] = retries
+    attrs["model"] = model
+    attrs.update(counts)
+
+    trace = _current_trace.get()
+    if trace:
+        # Stages of one report may run on several threads at once
+        with _totals_lock:
+            for key, value in counts.items():
+                trace["totals"][key] += value
+    return counts
+
+# --- Reading ---
+def load_spans(file_path=TRACE_FILE, tail_bytes=None):
+    """
+    Reads every exported span record, skipping lines that fail to parse. With
+    `tail_bytes` only the records in that many bytes at the end of the file are read.
+    """
+    records = []
+    try:
+        with open(file_path, 'rb') as f:
+            if tail_bytes is not None:
+                f.seek(0, os.SEEK_END)
+                start = max(0, f.tell() - tail_bytes)
+                f.seek(start)
+                if start:
+                    f.readline()  # Most likely the end of a record cut in half
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    records.append(json.loads(line))
+                except (json.JSONDecodeError, UnicodeDecodeError):
+                    continue
+    except FileNotFoundError:
+        return []
+    return records
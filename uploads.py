@@ -0,0 +1,232 @@
+import collections
+import hashlib
+import os
+import pickle
+import shutil
+import sys
+import threading
+import time
+import uuid
+import weakref
+
+# --- Configuration ---
+SPILL_DIR = os.environ.get("FOOTBALL_UPLOAD_SPILL", os.path.join(".cache", "uploads"))
+# Uploads larger than this are copied to disk and parsed from there
+SPILL_THRESHOLD_BYTES = int(os.environ.get("FOOTBALL_SPILL_THRESHOLD", 8 * 1024 * 1024))
+# Parsed uploads a single session may keep in memory before older ones go to disk
+SESSION_BUDGET_BYTES = int(os.environ.get("FOOTBALL_SESSION_BUDGET", 64 * 1024 * 1024))
+CSV_CHUNK_ROWS = 50_000
+# Text columns with fewer distinct values than this share of rows become categoricals
+CATEGORY_RATIO = 0.5
+COPY_BLOCK_BYTES = 1024 * 1024
+# Spill files older than this belong to sessions that ended without cleaning up (a crash or restart)
+SPILL_TTL_SECONDS = int(os.environ.get("FOOTBALL_SPILL_TTL", 24 * 60 * 60))
+SWEEP_INTERVAL_SECONDS = 60 * 60
+
+_sweep_lock = threading.Lock()
+_last_sweep = 0.0
+
+# --- Upload Identity and Spilling ---
+def upload_key(uploaded_file):
+    """Stable key for an uploaded file: its name, size and Streamlit file id."""
+    return f"{uploaded_file.name}:{uploaded_file.size}:{getattr(uploaded_file, 'file_id', '')}"
+
+def spill_to_disk(uploaded_file):
+    """
+    Copies a large upload to the spill directory in fixed-size blocks and returns the
+    path, so parsers read it from disk instead of from another in-memory copy. Small
+    uploads return None and are parsed straight from the upload buffer.
+    """
+    if uploaded_file.size <= SPILL_THRESHOLD_BYTES:
+        return None
+    os.makedirs(SPILL_DIR, exist_ok=True)
+    digest = hashlib.sha1(upload_key(uploaded_file).encode("utf-8")).hexdigest()
+    path = os.path.join(SPILL_DIR, f"{digest}{os.path.splitext(uploaded_file.name)[1]}")
+    if os.path.exists(path):
+        os.utime(path)  # Still in use: keep it out of the age sweep
+    else:
+        uploaded_file.seek(0)
+        with open(f"{path}.tmp", 'wb') as f:
+            shutil.copyfileobj(uploaded_file, f, COPY_BLOCK_BYTES)
+        os.replace(f"{path}.tmp", path)
+    uploaded_file.seek(0)
+    return path
+
+def _remove(paths):
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+def sweep_spill_dir(ttl=SPILL_TTL_SECONDS):
+    """Deletes spill files not touched for `ttl` seconds. Returns how many were removed."""
+    try:
+        names = os.listdir(SPILL_DIR)
+    except FileNotFoundError:
+        return 0
+    cutoff = time.time() - ttl
+    stale = []
+    for name in names:
+        path = os.path.join(SPILL_DIR, name)
+        try:
+            if os.path.isfile(path) and os.path.getmtime(path) < cutoff:
+                stale.append(path)
+        except FileNotFoundError:
+            pass
+    _remove(stale)
+    return len(stale)
+
+def _sweep_if_due():
+    """Runs the age sweep at startup and then at most once per SWEEP_INTERVAL_SECONDS."""
+    global _last_sweep
+    with _sweep_lock:
+        if time.time() - _last_sweep < SWEEP_INTERVAL_SECONDS:
+            return
+        _last_sweep = time.time()
+    sweep_spill_dir()
+
+def _delete_session_files(spilled, upload_copies):
+    _remove([path for path, _ in spilled.values()] + list(upload_copies.values()))
+
+# --- Compact CSV Reading ---
+def _compact_chunk(chunk):
+    """Downcasts numeric columns and turns repetitive text columns into categoricals."""
+    import pandas as pd
+
+    for column in chunk.columns:
+        series = chunk[column]
+        if pd.api.types.is_integer_dtype(series):
+            chunk[column] = pd.to_numeric(series, downcast="integer")
+        elif pd.api.types.is_float_dtype(series):
+            chunk[column] = pd.to_numeric(series, downcast="float")
+        elif (series.dtype == object or pd.api.types.is_string_dtype(series)) and len(series) \
+                and series.nunique(dropna=True) < CATEGORY_RATIO * len(series):
+            chunk[column] = series.astype("category")
+    return chunk
+
+def read_csv_compact(source, chunk_rows=CSV_CHUNK_ROWS):
+    """
+    Reads a CSV in row chunks, compacting each before the next is read so the raw
+    object-dtype frame never exists in full. Categorical columns are unioned across
+    chunks; a column whose chunks disagree on dtype falls back to pandas' own concat.
+    """
+    import pandas as pd
+    from pandas.api.types import union_categoricals
+
+    chunks = [_compact_chunk(chunk) for chunk in pd.read_csv(source, chunksize=chunk_rows)]
+    if not chunks:
+        return pd.DataFrame()
+    if len(chunks) == 1:
+        return chunks[0]
+
+    columns = {}
+    for column in chunks[0].columns:
+        parts = [chunk[column] for chunk in chunks]
+        if all(isinstance(part.dtype, pd.CategoricalDtype) for part in parts):
+            columns[column] = pd.Series(union_categoricals(parts), name=column)
+        else:
+            columns[column] = pd.concat(parts, ignore_index=True)
+    return pd.DataFrame(columns)
+
+def frame_bytes(df):
+    """Deep in-memory size of a DataFrame."""
+    return int(df.memory_usage(deep=True).sum())
+
+# --- Session Budget ---
+class SessionStore:
+    """
+    Per-session cache of parsed uploads under a memory budget. Entries are kept in
+    least-recently-used order; when the budget is exceeded the oldest are pickled to
+    the spill directory and transparently reloaded on the next `get`. The session's
+    disk files are deleted when the store is garbage collected with its session.
+    """
+
+    def __init__(self, budget_bytes=SESSION_BUDGET_BYTES):
+        self.budget_bytes = budget_bytes
+        self._entries = collections.OrderedDict()  # key -> (value, nbytes)
+        self._spilled = {}                          # key -> (path, nbytes)
+        self._upload_copies = {}                    # key -> path of a spilled raw upload
+        self.evictions = 0
+        self._prefix = uuid.uuid4().hex[:12]
+        # Holds the dicts, not the store, so it runs once the session's store is collected
+        weakref.finalize(self, _delete_session_files, self._spilled, self._upload_copies)
+        _sweep_if_due()
+
+    def get(self, key):
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            return self._entries[key][0]
+        if key in self._spilled:
+            path, nbytes = self._spilled.pop(key)
+            try:
+                with open(path, 'rb') as f:
+                    value = pickle.load(f)
+            except FileNotFoundError:
+                return None  # Swept as stale; the caller parses the upload again
+            os.remove(path)
+            self.put(key, value, nbytes)
+            return value
+        return None
+
+    def put(self, key, value, nbytes=None):
+        if nbytes is None:
+            nbytes = frame_bytes(value) if hasattr(value, "memory_usage") else sys.getsizeof(value)
+        self._entries[key] = (value, nbytes)
+        self._entries.move_to_end(key)
+        self._evict()
+
+    def _evict(self):
+        # The newest entry always stays in memory, even when it alone exceeds the budget
+        while self.memory_bytes() > self.budget_bytes and len(self._entries) > 1:
+            key, (value, nbytes) = self._entries.popitem(last=False)
+            os.makedirs(SPILL_DIR, exist_ok=True)
+            path = os.path.join(SPILL_DIR, f"{self._prefix}-{hashlib.sha1(key.encode('utf-8')).hexdigest()}.pkl")
+            with open(path, 'wb') as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            self._spilled[key] = (path, nbytes)
+            self.evictions += 1
+
+    def spill_upload(self, uploaded_file):
+        """spill_to_disk, remembering the copy so `retain` can delete it later."""
+        path = spill_to_disk(uploaded_file)
+        if path:
+            self._upload_copies[upload_key(uploaded_file)] = path
+        return path
+
+    def retain(self, keys):
+        """Drops entries and disk copies for uploads that are no longer selected in the session."""
+        keys = set(keys)
+        for key in [k for k in self._entries if k not in keys]:
+            del self._entries[key]
+        stale_files = [self._spilled.pop(k)[0] for k in list(self._spilled) if k not in keys]
+        stale_files += [self._upload_copies.pop(k) for k in list(self._upload_copies) if k not in keys]
+        _remove(stale_files)
+
+    def memory_bytes(self):
+        return sum(nbytes for _, nbytes in self._entries.values())
+
+    def footprint(self):
+        """Memory and disk usage of the session's parsed uploads, for tracing and display."""
+        return {
+            "session_memory_bytes": self.memory_bytes(),
+            "session_spilled_bytes": sum(nbytes for _, nbytes in self._spilled.values()),
+            "session_entries": len(self._entries),
+            "session_evictions": self.evictions,
+            "process_rss_bytes": process_rss_bytes(),
+        }
+
+def process_rss_bytes():
+    """Resident set size of the server process, or None where /proc is unavailable."""
+    try:
+        with open("/proc/self/statm", 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+def record_footprint(attrs, store, session_id=None):
+    """Copies a session's memory footprint onto a span."""
+    attrs.update(store.footprint())
+    if session_id:
+        attrs["session_id"] = session_id
+    return attrs